@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.benchmark
+
+runs problems through the whole pipeline several times, and
+times each stage on its own, to tell whether a slowdown comes
+from the Python side or from Maude. the stages are those of
+Main.frontEnd, in the same order:
+
+    parse     Parser.parseTheory, lexed while parsed (@see
+              Parser.parseAxioms)
+    optimize  Slicer and Simplifier (@see Main.optimize)
+    finder    ModelFinder, a quarter of the timeout
+    saturate  Saturator, with the time the finder left
+    fill      Filler.getMaudeModule
+    spawn   Maude process: wall time minus what Maude reports
+            as real time (startup, parsing the module, exit)
+    maude   real time reported by Maude for the rewrite
+
+median and 95th percentile of each stage is reported in a
+table, and optionally as JSON.
+
+with --synthetic N a theory of N axioms is generated, and
+the peak memory used to parse it is measured in a process
+of its own (@see Benchmark.memory)
+"""
+
+import sys      # command line arguments and output
+import os       # walk corpus directories
+import re       # argument testing
+import time     # timing
+import math     # ceil of percentile rank
+import tempfile # Maude modules are given as files
+import resource # peak memory of parsing
+from StringIO import StringIO
+try:
+    import json
+except ImportError:
+    import simplejson as json
+from org.noah.pexpect import pexpect
+from no.uio.ifi.bjarneh.parse.cmdline import GetOpt
+from no.uio.ifi.bjarneh.cl.parse.Parser import Parser
+from no.uio.ifi.bjarneh.cl.template.filler import Filler
+from no.uio.ifi.bjarneh.cl.optimize.slicing import Slicer
+from no.uio.ifi.bjarneh.cl.optimize.simplify import Simplifier
+from no.uio.ifi.bjarneh.cl.optimize.saturate import Saturator
+from no.uio.ifi.bjarneh.cl.engine.finder import ModelFinder
+from no.uio.ifi.bjarneh.cl.result import ProofResult
+from no.uio.ifi.bjarneh.cl.main import Main
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='benchmark.py 0.1'
+
+
+class Benchmark(object):
+    """
+    monobench - benchmark the monologue pipeline
+
+    usage: monobench [OPTIONS] [file.gl|directory ...]
+
+    all problems in src/bin/problems are benchmarked, plus
+    the files given, directories are searched for .gl files.
+    problems with syntax errors are reported and skipped,
+    without Maude only the Python stages are timed
+
+    options:
+
+    -h  --help              print this menu and exit
+    -n  --repeat            repetitions of each problem          [          5 ]
+    -l  --level             how deep in terms of iterations      [        100 ]
+    -t  --timeout           timeout value in seconds             [        3.0 ]
+    -m  --maude             specify another Maude location       [      maude ]
+    -j  --json              write JSON report to this file       [       NULL ]
+    -o  --output            where to send the table              [ sys.stdout ]
+    -s  --synthetic         memory used to parse N axioms        [       NULL ]
+
+    """
+
+    stages = ['parse', 'optimize', 'finder', 'saturate', 'fill',
+              'spawn', 'maude']
+
+    defaults = {}
+    defaults['repeat']   = 5
+    defaults['level']    = 100
+    defaults['timeout']  = 3.0
+    defaults['Maude']    = 'maude'
+    defaults['json']     = None
+    defaults['output']   = sys.stdout
+    defaults['synthetic'] = []
+    defaults['problems'] = os.path.join(os.path.dirname(
+                               os.path.abspath(sys.argv[0])), 'problems')
+
+
+    def __init__(self, argv):
+        inputfiles = self.parseArgv(argv)
+        report = self.run(inputfiles)
+        self.writeTable(report)
+        if self.defaults['synthetic']:
+            report['memory'] = self.memory(self.defaults['synthetic'])
+            self.writeMemory(report['memory'])
+        if self.defaults['json']:
+            fh = open(self.defaults['json'], 'w')
+            fh.write(json.dumps(report, indent=2) + '\n')
+            fh.close()
+        sys.exit(0)
+
+
+    def parseArgv(self, argv):
+        """ parse input arguments, return list of input files """
+
+        getopt = GetOpt()
+        getopt.add_bool_option(['-h', '-help', '--help', '?'])
+        getopt.add_str_option( ['-n', '-repeat', '--repeat', '-repeat=', '--repeat='],
+                              test=lambda x : re.match(r"^[1-9]\d*$", x),
+                              errormsg=" -repeat: must be a positive number")
+        getopt.add_str_option( ['-l', '-level', '--level', '-level=', '--level='],
+                              test=lambda x : re.match(r"^\d+$", x),
+                              errormsg=" -level: must be a number")
+        getopt.add_str_option( ['-t', '-timeout', '--timeout', '-timeout=', '--timeout='],
+                              test=lambda x : re.match(r"^\d*\.?\d+$", x),
+                              errormsg=" -timeout: value must be number ")
+        getopt.add_str_option( ['-m', '-maude', '--maude', '-maude=', '--maude='])
+        getopt.add_str_option( ['-j', '-json', '--json', '-json=', '--json='])
+        getopt.add_str_option( ['-o', '-output', '--output', '-output=', '--output='])
+        getopt.add_str_option( ['-s', '-synthetic', '--synthetic', '-synthetic=', '--synthetic='],
+                              test=lambda x : re.match(r"^[1-9]\d*$", x),
+                              errormsg=" -synthetic: must be a positive number")
+
+        try:
+            (opts, args) = getopt.parse(argv)
+        except Exception, inst:
+            sys.stderr.write(str(inst) + '\n')
+            sys.exit(1)
+
+        keys = opts.keys()
+
+        if('-h' in keys):   self.help()
+        if('-n' in keys):   self.defaults['repeat']  = int(opts['-n'][0])
+        if('-l' in keys):   self.defaults['level']   = int(opts['-l'][0])
+        if('-t' in keys):   self.defaults['timeout'] = float(opts['-t'][0])
+        if('-m' in keys):   self.defaults['Maude']   = opts['-m'][0]
+        if('-j' in keys):   self.defaults['json']    = opts['-j'][0]
+        if('-o' in keys):   self.defaults['output']  = open(opts['-o'][0], 'w')
+        if('-s' in keys):   self.defaults['synthetic'] = [ int(n) for n in opts['-s'] ]
+
+        return self.problemFiles(self.defaults['problems']) + \
+               sum([ self.problemFiles(a) for a in args ], [])
+
+
+    def problemFiles(self, path):
+        """ path itself, or all .gl files below directory path """
+        if not os.path.isdir(path):
+            return [path]
+        found = []
+        for (dirname, dirs, fnames) in os.walk(path):
+            dirs.sort()
+            for fname in sorted(fnames):
+                if fname.endswith('.gl'):
+                    found.append(os.path.join(dirname, fname))
+        return found
+
+
+    def run(self, inputfiles):
+        """ benchmark all input files, return report (dict) """
+
+        whichMaude = Main.which(self.defaults['Maude'])
+        if not whichMaude:
+            sys.stderr.write("[WARNING] Maude not found, only timing Python stages\n")
+
+        report = {}
+        report['repeat']  = self.defaults['repeat']
+        report['level']   = self.defaults['level']
+        report['timeout'] = self.defaults['timeout']
+        report['maude']   = whichMaude
+        report['files']   = []
+
+        for inputfile in inputfiles:
+            report['files'].append(self.runFile(inputfile, whichMaude))
+
+        return report
+
+
+    def runFile(self, inputfile, whichMaude):
+        """ time each stage of inputfile 'repeat' times """
+
+        samples = {}
+        for stage in Benchmark.stages:
+            samples[stage] = []
+
+        entry = {}
+        entry['file'] = inputfile
+        entry['status'] = None
+
+        for i in range(0, self.defaults['repeat']):
+            try:
+                mm = self.frontEnd(inputfile, samples)
+            except SystemExit:
+                entry['status'] = 'syntax error'
+                break
+            if whichMaude:
+                entry['status'] = self.backEnd(whichMaude, mm, samples)
+
+        entry['stages'] = {}
+        for stage in Benchmark.stages:
+            entry['stages'][stage] = Benchmark.summary(samples[stage])
+
+        return entry
+
+
+    def frontEnd(self, inputfile, samples):
+        """ what Main.frontEnd does with the default options,
+        one stage at a time, return Maude module. the finder
+        is timed even if it finds a model, Maude is run anyway """
+
+        timeout = self.defaults['timeout']
+
+        # parse errors are reported by us, not by the Parser
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            times = [ time.time() ]
+            theory = Parser().parseTheory(inputfile)
+            times.append(time.time())
+            if Main.defaults['slice']:
+                theory = Slicer(theory).slice()
+            theory = Simplifier(theory).simplify()
+            times.append(time.time())
+            if Main.defaults['bound']:
+                ModelFinder(theory, timeout / 4,
+                            Main.defaults['bound']).find()
+            times.append(time.time())
+            timeout = max(timeout - (times[-1] - times[-2]), 0.0)
+            theory = Saturator(theory, timeout).saturate()
+            times.append(time.time())
+            mm = Filler(theory).getMaudeModule(self.defaults['level'],
+                                               "--- no print attribute ")
+            times.append(time.time())
+        finally:
+            sys.stderr = stderr
+
+        for i in range(0, len(times) - 1):
+            stage = Benchmark.stages[i]
+            samples[stage].append(1000 * (times[i + 1] - times[i]))
+
+        return mm
+
+
+    def backEnd(self, whichMaude, MaudeModule, samples):
+        """ run Maude on module, return status """
+
+        (fd, fname) = tempfile.mkstemp(suffix=".maude",
+                                       prefix="monobench-",
+                                       text=1)
+        os.write(fd, MaudeModule)
+        os.close(fd)
+
+        text = "[TIMEOUT]"
+        child = None
+        start = time.time()
+        try:
+            child = pexpect.spawn(whichMaude,
+                                  args=['-no-banner', '-no-ansi-color', fname],
+                                  timeout=self.defaults['timeout'])
+            child.expect(pexpect.EOF)
+            text = child.before
+        except:
+            if child and child.isalive():
+                child.terminate(force=1)
+        wall = 1000 * (time.time() - start)
+
+        os.unlink(fname)
+
+        result = ProofResult.fromMaude(text)
+        if result.real is not None:
+            samples['spawn'].append(max(0.0, wall - result.real))
+            samples['maude'].append(float(result.real))
+
+        return result.status
+
+
+    @staticmethod
+    def percentile(sortedSamples, pct):
+        """ nearest rank percentile of sorted samples """
+        rank = int(math.ceil(pct * len(sortedSamples) / 100.0))
+        rank = min(max(rank, 1), len(sortedSamples))
+        return sortedSamples[rank - 1]
+
+    @staticmethod
+    def summary(samples):
+        """ median and 95th percentile (milliseconds) """
+        if not samples:
+            return {'median' : None, 'p95' : None, 'samples' : []}
+        s = sorted(samples)
+        n = len(s)
+        if n % 2:
+            median = s[n / 2]
+        else:
+            median = (s[n / 2 - 1] + s[n / 2]) / 2.0
+        return {'median'  : round(median, 3),
+                'p95'     : round(Benchmark.percentile(s, 95), 3),
+                'samples' : [ round(x, 3) for x in samples ]}
+
+
+    def writeTable(self, report):
+        """ one row for each file: median / p95 for each stage """
+
+        out = self.defaults['output']
+        cell = "%19s"
+        header = "%-24s"%("file") + ''.join([ cell%(s) for s in Benchmark.stages ])
+        out.write("median / p95 in ms, %d repetitions\n\n"%(report['repeat']))
+        out.write(header + "  status\n")
+        out.write("-" * (len(header) + 14) + "\n")
+
+        totals = {}
+        for stage in Benchmark.stages:
+            totals[stage] = 0.0
+
+        for entry in report['files']:
+            row = "%-24s"%(os.path.basename(entry['file']))
+            for stage in Benchmark.stages:
+                s = entry['stages'][stage]
+                if s['median'] is None:
+                    row += cell%("-")
+                else:
+                    row += cell%("%.2f / %.2f"%(s['median'], s['p95']))
+                    totals[stage] += s['median']
+            out.write(row + "  %s\n"%(entry['status'] or '-'))
+
+        out.write("-" * (len(header) + 14) + "\n")
+        row = "%-24s"%("sum of medians")
+        for stage in Benchmark.stages:
+            row += cell%("%.2f"%(totals[stage]))
+        out.write(row + "\n")
+
+
+    def memory(self, sizes):
+        """ peak memory (ru_maxrss) used to parse synthetic theories,
+        each theory is parsed in a child process, so that one
+        measurement does not inherit the peak of another"""
+
+        report = []
+
+        for n in sizes:
+            (fd, fname) = tempfile.mkstemp(suffix=".gl", prefix="monobench-")
+            fh = os.fdopen(fd, 'w')
+            Benchmark.syntheticTheory(n, fh)
+            fh.close()
+
+            (r, w) = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(r)
+                before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                start = time.time()
+                theory = Parser().parseTheory(fname)
+                seconds = time.time() - start
+                after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                os.write(w, "%d %d %f"%(before, after, seconds))
+                os._exit(0)
+
+            os.close(w)
+            data = os.read(r, 1024)
+            os.close(r)
+            os.waitpid(pid, 0)
+            os.unlink(fname)
+
+            (before, after, seconds) = data.split()
+            delta = int(after) - int(before)  # kilobytes on linux
+            entry = {}
+            entry['axioms']      = n
+            entry['peak_kb']     = int(after)
+            entry['delta_kb']    = delta
+            entry['bytes_axiom'] = round(1024.0 * delta / n, 1)
+            entry['parse_ms']    = round(1000 * float(seconds), 3)
+            report.append(entry)
+
+        return report
+
+
+    @staticmethod
+    def syntheticTheory(n, fh):
+        """ write n axioms: facts, double rules, splits and exists
+        rules over 20 predicates of each kind and n/4 constants"""
+        fh.write("true => dom(c0).\n")
+        for i in range(0, n):
+            p = i % 20
+            c = i / 4
+            k = i % 4
+            if k == 0:
+                fh.write("true => p%d(c%d, c%d).\n"%(p, c, c + 1))
+            elif k == 1:
+                fh.write("p%d(X,Y), q%d(Y,Z) => p%d(X,Z).\n"%(p, p, (p + 1) % 20))
+            elif k == 2:
+                fh.write("p%d(X,c%d) => q%d(X,c%d) ; r%d(X).\n"%(p, c, p, c, p))
+            else:
+                fh.write("r%d(X) => dom(Y), q%d(X,Y).\n"%(p, p))
+
+
+    def writeMemory(self, memory):
+        """ one row for each synthetic theory """
+        out = self.defaults['output']
+        out.write("\nmemory used to parse synthetic theories\n\n")
+        out.write("%12s%14s%14s%14s%14s\n"%("axioms", "peak kB", "delta kB",
+                                           "bytes/axiom", "parse ms"))
+        out.write("-" * 68 + "\n")
+        for m in memory:
+            out.write("%12d%14d%14d%14.1f%14.1f\n"%(m['axioms'], m['peak_kb'],
+                                                  m['delta_kb'], m['bytes_axiom'],
+                                                  m['parse_ms']))
+
+
+    def help(self):
+        """ print help message (help is self.__doc__) """
+        for line in self.__doc__.split("\n"):
+            sys.stdout.write(line[3:]+'\n')
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.cache
+
+a persistent cache of proof results, one file per result,
+named by a hash of everything that decides the result: the
+Maude module, the level, the timeout and the Maude version.
+only decided results are worth keeping, a timeout or an error
+may be gone the next time we try (@see ResultCache.decided).
+files are written to a temporary name and renamed, so that
+several processes (--jobs) can share the same directory.
+
+old entries are removed by evict(), first the ones which are
+older than maxage, then the least recently used ones until the
+cache is smaller than maxsize.
+
+parsed theories are kept in the 'theories' directory of the same
+cache (TheoryCache), named by a hash of the path, size, mtime and
+content of the input file, so that an unchanged file is never
+lexed and parsed twice.
+
+example:
+
+    cache = ResultCache('/tmp/monologue')
+    key = ResultCache.key(module, 100, 3.0, '2.4')
+    result = cache.get(key)
+    if result is None:
+        result = proveSomehow(module)
+        if ResultCache.decided(result):
+            cache.put(key, result)
+    cache.evict()
+
+    theories = TheoryCache('/tmp/monologue')
+    key = TheoryCache.fileKey('problems/ap.gl')
+    theory = theories.load(key)
+
+"""
+
+import os       # files and directories
+import time     # age of entries
+import tempfile # atomic writes
+from no.uio.ifi.bjarneh.cl.parse import Binary
+from no.uio.ifi.bjarneh.cl.result import ProofResult
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='cache.py 0.1'
+
+
+class ResultCache(object):
+    """
+    ResultCache
+    entries are stored as  directory/ab/abcdef...  to avoid
+    huge directories, reading an entry updates its mtime
+    which makes evict() remove the least recently used first
+    """
+
+    maxsize = 64 * 1024 * 1024     # bytes
+    maxage  = 30 * 24 * 60 * 60    # seconds
+
+    def __init__(self, directory, maxsize=None, maxage=None):
+        self.directory = directory
+        if maxsize is not None: self.maxsize = maxsize
+        if maxage  is not None: self.maxage  = maxage
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def key(module, level, timeout, version):
+        """ hash of everything which decides the result """
+        h = sha1()
+        h.update(module)
+        h.update("\0level=%s\0timeout=%s\0version=%s"
+                 %(level, timeout, version))
+        return h.hexdigest()
+
+    @staticmethod
+    def decided(text):
+        """ true if the Maude text is a result we can trust later """
+        status = ProofResult.fromMaude(text).status
+        return status in ('valid', 'saturated', 'countersatisfiable')
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """ return cached result or None """
+        fname = self.path(key)
+        try:
+            fh = open(fname, 'rb') # theories are binary (@see TheoryCache)
+            result = fh.read()
+            fh.close()
+            os.utime(fname, None)
+        except (IOError, OSError):
+            return None
+        return result
+
+    def put(self, key, result):
+        """ store result """
+        fname = self.path(key)
+        dirname = os.path.dirname(fname)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            (fd, tmpname) = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+            os.write(fd, result)
+            os.close(fd)
+            os.rename(tmpname, fname)
+        except (IOError, OSError):
+            pass # a cache which fails to write is just a miss later on
+
+    def evict(self):
+        """ remove entries which are too old, and then the least
+        recently used until the total size is below maxsize"""
+
+        now = time.time()
+        entries = []
+        total = 0
+
+        for (dirname, dirs, fnames) in os.walk(self.directory):
+            for fname in fnames:
+                fullname = os.path.join(dirname, fname)
+                try:
+                    st = os.stat(fullname)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.maxage:
+                    self.remove(fullname)
+                else:
+                    entries.append((st.st_mtime, st.st_size, fullname))
+                    total += st.st_size
+
+        entries.sort()
+
+        for (mtime, size, fullname) in entries:
+            if total <= self.maxsize:
+                break
+            self.remove(fullname)
+            total -= size
+
+    def remove(self, fullname):
+        try:
+            os.unlink(fullname)
+        except OSError:
+            pass
+
+#______________________________________________________________________________
+
+class TheoryCache(ResultCache):
+    """
+    TheoryCache
+    flattened theories are stored as compiled theories (@see parse.Binary),
+    the format version is part of the key so that theories of
+    older versions are never loaded, and a theory is only loaded
+    if none of the libraries it includes have changed
+    """
+
+    def __init__(self, directory, maxsize=None, maxage=None):
+        ResultCache.__init__(self, os.path.join(directory, 'theories'),
+                             maxsize, maxage)
+
+    @staticmethod
+    def fileKey(fname):
+        """ hash of path, size, mtime and content of fname,
+        None if the file cannot be read (e.g. stdin)"""
+        try:
+            st = os.stat(fname)
+            content = sha1()
+            fh = open(fname, 'rb')
+            data = fh.read(65536)
+            while data:
+                content.update(data)
+                data = fh.read(65536)
+            fh.close()
+        except (IOError, OSError):
+            return None
+        h = sha1()
+        h.update("%s\0size=%d\0mtime=%r\0content=%s\0format=%d"
+                 %(os.path.abspath(fname), st.st_size, st.st_mtime,
+                   content.hexdigest(), Binary.version))
+        return h.hexdigest()
+
+    def load(self, key):
+        """ return cached theory or None """
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            theory = Binary.loads(data)
+        except Exception:
+            return None # broken entry, it is replaced by store()
+        for (path, size, mtime) in theory.includes:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            if st.st_size != size or st.st_mtime != mtime:
+                return None
+        return theory
+
+    def store(self, key, theory):
+        self.put(key, Binary.dumps(theory))
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.engine.cdcl
+
+a conflict driven clause learning SAT solver, written in plain
+Python for the clauses of a grounded theory (@see engine.sat).
+variables are numbered from 1, a literal is a variable (true)
+or a negated variable (false), as in DIMACS:
+
+    solver = Solver()
+    (p, q) = (solver.newVar(), solver.newVar())
+    solver.addClause([ p, q ])
+    solver.addClause([ -p ])
+    if solver.solve():
+        print solver.model[q]       # True
+
+what it does: unit propagation with two watched literals, a
+learned clause for each conflict (first unique implication
+point), the variable with the highest activity is decided next
+(VSIDS), variables are given the value they had last time
+(phase saving, false the first time) and the search is
+restarted now and then, with learned clauses kept.
+
+"""
+
+import time     # timeout
+import heapq    # variables ordered by activity
+from no.uio.ifi.bjarneh.cl.engine.prover import Timeout
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='cdcl.py 0.1'
+
+
+class Solver(object):
+    """
+    Solver
+    assign[v] is True, False or None, level[v] is the decision
+    level where v was assigned, and reason[v] the clause which
+    made it unit (None for decisions), trail holds the literals
+    made true in order, limits the length of trail at each level
+    """
+
+    decay   = 0.95
+    restart = 100   # conflicts before the first restart
+
+    def __init__(self):
+        self.nvars = 0
+        self.clauses = []
+        self.learnts = 0
+        self.watches = {}   # literal -> [ clauses where it is watched ]
+        self.units = []
+        self.empty = 0      # an empty clause was added
+        self.assign = [None]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.heap = []
+        self.inc = 1.0
+        self.trail = []
+        self.limits = []
+        self.qhead = 0
+        self.conflicts = 0
+        self.deadline = None
+        self.model = None
+
+    def newVar(self):
+        self.nvars += 1
+        self.assign.append(None)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        heapq.heappush(self.heap, (0.0, self.nvars))
+        return self.nvars
+
+    def addClause(self, literals):
+        """ before solve() is called """
+        clause = []
+        for lit in literals:
+            if -lit in clause:
+                return # always true
+            if lit not in clause:
+                clause.append(lit)
+        if not clause:
+            self.empty = 1
+        elif len(clause) == 1:
+            self.units.append(clause[0])
+        else:
+            self.clauses.append(clause)
+            self.watch(clause)
+
+    def watch(self, clause):
+        """ the first two literals of a clause are watched """
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+
+    def value(self, lit):
+        v = self.assign[abs(lit)]
+        if v is None or lit > 0:
+            return v
+        return not v
+
+    def solve(self, timeout=None):
+        """ True if the clauses can be satisfied (model holds the
+        values, model[v] for v in 1..nvars), False if they cannot,
+        raise Timeout if it takes more than timeout seconds """
+
+        if timeout is not None:
+            self.deadline = time.time() + timeout
+        if self.empty:
+            return False
+        for lit in self.units:
+            if self.value(lit) is False:
+                return False
+            if self.value(lit) is None:
+                self.enqueue(lit, None)
+
+        restart = Solver.restart
+
+        while 1:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.limits:
+                    return False
+                (learnt, back) = self.analyze(conflict)
+                self.cancel(back)
+                self.learn(learnt)
+                self.inc /= Solver.decay
+                if self.conflicts % 64 == 0:
+                    self.tick()
+                if self.conflicts >= restart:
+                    restart += int(restart * 1.5)
+                    self.cancel(0)
+            else:
+                var = self.pick()
+                if var is None:
+                    self.model = [ bool(v) for v in self.assign ]
+                    return True
+                self.limits.append(len(self.trail))
+                if self.phase[var]:
+                    self.enqueue(var, None)
+                else:
+                    self.enqueue(-var, None)
+
+    def tick(self):
+        if self.deadline and time.time() > self.deadline:
+            raise Timeout()
+
+    def enqueue(self, lit, reason):
+        var = abs(lit)
+        self.assign[var] = lit > 0
+        self.level[var] = len(self.limits)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        """ unit propagation, return a clause where every
+        literal is false, or None if there is no conflict """
+
+        while self.qhead < len(self.trail):
+            false = -self.trail[self.qhead]
+            self.qhead += 1
+            watchers = self.watches.get(false, [])
+            kept = []
+            i = 0
+            while i < len(watchers):
+                clause = watchers[i]
+                i += 1
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                if self.value(first) is True:
+                    kept.append(clause)
+                    continue
+                moved = 0
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(clause)
+                        moved = 1
+                        break
+                if moved:
+                    continue
+                kept.append(clause)
+                if self.value(first) is False:
+                    self.watches[false] = kept + watchers[i:]
+                    return clause
+                self.enqueue(first, clause)
+            self.watches[false] = kept
+        return None
+
+    def analyze(self, conflict):
+        """ learned clause (first unique implication point) and
+        the level to go back to, the first literal of the learned
+        clause is the one which is unit when we get there """
+
+        level = len(self.limits)
+        seen = set()
+        learnt = [None]
+        counter = 0
+        lit = None
+        clause = conflict
+        index = len(self.trail) - 1
+
+        while 1:
+            for q in clause:
+                if q == lit:
+                    continue
+                var = abs(q)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.level[var] == level:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reason[abs(lit)]
+
+        learnt[0] = -lit
+
+        back = 0
+        for k in range(1, len(learnt)):
+            if self.level[abs(learnt[k])] > back:
+                back = self.level[abs(learnt[k])]
+                learnt[1], learnt[k] = learnt[k], learnt[1]
+
+        return (learnt, back)
+
+    def learn(self, learnt):
+        if len(learnt) == 1:
+            self.enqueue(learnt[0], None)
+        else:
+            self.clauses.append(learnt)
+            self.learnts += 1
+            self.watch(learnt)
+            self.enqueue(learnt[0], learnt)
+
+    def cancel(self, level):
+        """ undo every assignment above level """
+        if len(self.limits) <= level:
+            return
+        for lit in self.trail[self.limits[level]:]:
+            var = abs(lit)
+            self.phase[var] = self.assign[var]
+            self.assign[var] = None
+            self.reason[var] = None
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[self.limits[level]:]
+        del self.limits[level:]
+        self.qhead = len(self.trail)
+
+    def bump(self, var):
+        self.activity[var] += self.inc
+        if self.activity[var] > 1e100:
+            for v in range(1, self.nvars + 1):
+                self.activity[v] *= 1e-100
+            self.inc *= 1e-100
+        if self.assign[var] is None:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def pick(self):
+        """ unassigned variable with the highest activity """
+        while self.heap:
+            (activity, var) = heapq.heappop(self.heap)
+            if self.assign[var] is None:
+                return var
+        return None
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.engine.datalog
+
+a semi-naive Datalog evaluator for the Horn part of a theory,
+i.e., rules without disjunction and without fresh variables.
+when all the rules of a theory are like that (and the facts are
+ground) there is only one branch, and nothing to search for,
+the theory is valid if the premises of a goal (or false) axiom
+are among the facts once they are closed under the rules:
+
+    true => e(a, b), e(b, c).
+    e(X, Y) => lt(X, Y).
+    lt(X, Y), lt(Y, Z) => lt(X, Z).
+    lt(a, c) => goal.
+
+a rule is only matched if one of its premises is a fact from the
+last round (semi-naive), and facts are indexed by the value of
+each argument, so a premise with a bound variable only looks at
+the facts it can match. which variables are bound is known before
+we start, so each rule is compiled once for each premise that
+can be the new fact (@see Datalog.compile). rules like symmetry
+and transitivity are not compiled, the facts are closed under
+them as they are added (@see prover.Closure).
+
+example:
+
+    if Datalog.horn(theory):
+        datalog = Datalog(theory)
+        (status, rewrites) = datalog.prove(3.0)
+
+    facts = Datalog(theory, goals=0).run()
+
+"""
+
+import time     # timeout
+from no.uio.ifi.bjarneh.cl.engine.prover import Rule, Relations, Closure, \
+                                               isVariable, Timeout
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='datalog.py 0.1'
+
+
+# the conclusion of goal rules, it is never a fact of the input,
+# predicate ids start at 1 (@see Rule)
+GOAL = (0, ())
+
+
+class Datalog(object):
+    """
+    Datalog
+    facts are kept as in a prover Branch: id of predicate -> set of
+    terms, and indexed:  (id of predicate, position, value) -> [ terms ]
+    a compiled premise is:  (key, args, variables, position)  where
+    variables tells which args are variables, and position is the
+    arg used to look up facts in the index (-1 means all facts)
+    """
+
+    def __init__(self, theory, goals=1):
+        self.facts = {}
+        self.index = {}
+        self.rules = {}     # key of premise -> [ (first, rest, conclusion) ]
+        self.delta = []     # facts of the input
+        self.deadline = None
+        self.work = 0       # facts looked at since the last tick
+
+        (rules, self.symbols) = Rule.compile(theory)
+
+        # symmetry, transitivity etc. are done as facts are added
+        relations = Relations.find(rules)
+        self.closure = None
+        if relations.labels:
+            self.closure = Closure(relations)
+
+        for rule in rules:
+            if rule.label in relations.labels:
+                continue
+            if rule.kind == 'goal':
+                if not goals:
+                    continue
+                conclusion = [ GOAL ]
+            elif rule.kind == 'horn':
+                conclusion = rule.disjuncts[0]
+            else:
+                continue
+            if rule.premises:
+                for i in range(len(rule.premises)):
+                    key = rule.premises[i][0]
+                    (first, rest) = Datalog.compile(rule.premises, i)
+                    self.rules.setdefault(key, []).append((first, rest,
+                                                           conclusion))
+            elif Datalog.ground(conclusion):
+                self.delta += self.add(self.close(conclusion))
+
+    @staticmethod
+    def horn(theory):
+        """ true if the theory needs no search, fact axioms
+        with variables are exists rules (@see prover.Rule) """
+        (rules, symbols) = Rule.compile(theory)
+        for rule in rules:
+            if rule.kind not in ('horn', 'goal'):
+                return 0
+        return 1
+
+    @staticmethod
+    def compile(premises, i):
+        """ premise i first, then the others in order """
+        bound = set()
+        compiled = []
+        for (key, args) in [ premises[i] ] + premises[:i] + premises[i+1:]:
+            variables = tuple([ isVariable(a) for a in args ])
+            position = -1
+            for j in range(len(args)):
+                if not variables[j] or args[j] in bound:
+                    position = j
+                    break
+            compiled.append((key, args, variables, position))
+            bound.update([ a for a in args if isVariable(a) ])
+        return (compiled[0], compiled[1:])
+
+    @staticmethod
+    def unify(premise, terms, subst):
+        """ Branch.unify for a compiled premise """
+        (key, args, variables, position) = premise
+        s = subst
+        for i in range(len(args)):
+            if variables[i]:
+                value = s.get(args[i])
+                if value is None:
+                    if s is subst: s = dict(subst)
+                    s[args[i]] = terms[i]
+                elif value != terms[i]:
+                    return None
+            elif args[i] != terms[i]:
+                return None
+        return s
+
+    @staticmethod
+    def ground(atoms):
+        for (key, args) in atoms:
+            for t in args:
+                if isVariable(t):
+                    return 0
+        return 1
+
+    def run(self):
+        """ close the facts under the rules, return the new facts
+        in the order they are found, stop if goal is found """
+
+        derived = []
+        delta = self.delta
+
+        while delta and not self.goal():
+            new = set()
+            for (key, terms) in delta:
+                self.tick()
+                for (first, rest, conclusion) in self.rules.get(key, ()):
+                    s = Datalog.unify(first, terms, {})
+                    if s is None:
+                        continue
+                    for s2 in self.matches(rest, s):
+                        for (k, args) in conclusion:
+                            atom = (k, tuple([ s2.get(t, t) for t in args ]))
+                            if atom[1] not in self.facts.get(k, ()):
+                                new.add(atom)
+            delta = self.close(sorted(new)) # the same order every time
+            self.add(delta)
+            derived += delta
+
+        self.delta = []
+        return [ atom for atom in derived if atom != GOAL ]
+
+    def prove(self, timeout):
+        """ return (status, rewrites), where status is one
+        of: valid, saturated, timeout"""
+        self.deadline = time.time() + timeout
+        try:
+            rewrites = len(self.run())
+        except Timeout:
+            return ('timeout', None)
+        if self.goal():
+            return ('valid', rewrites + 1)
+        return ('saturated', rewrites)
+
+    def goal(self):
+        return GOAL[1] in self.facts.get(GOAL[0], ())
+
+    def tick(self):
+        if self.deadline and time.time() > self.deadline:
+            raise Timeout()
+
+    def step(self, facts):
+        """ tick now and then inside the joins, one rule can
+        look at a lot of facts (@see Prover.step) """
+        self.work += facts + 1
+        if self.work > 4096:
+            self.work = 0
+            self.tick()
+
+    def close(self, atoms):
+        """ atoms closed under the relations (@see prover.Closure) """
+        if self.closure:
+            return self.closure.close(atoms)
+        return atoms
+
+    def add(self, atoms):
+        """ add ground atoms, return the ones which are new """
+        new = []
+        for (key, terms) in atoms:
+            known = self.facts.setdefault(key, set())
+            if terms not in known:
+                known.add(terms)
+                new.append((key, terms))
+                for i in range(len(terms)):
+                    self.index.setdefault((key, i, terms[i]), []).append(terms)
+        return new
+
+    def matches(self, premises, subst):
+        """ like Branch.matches, for compiled premises """
+        if not premises:
+            yield subst
+            return
+        (key, args, variables, position) = premises[0]
+        if position < 0:
+            candidates = self.facts.get(key, ())
+        else:
+            value = subst.get(args[position], args[position])
+            candidates = self.index.get((key, position, value), ())
+        self.step(len(candidates))
+        for terms in candidates:
+            s = Datalog.unify(premises[0], terms, subst)
+            if s is not None:
+                for s2 in self.matches(premises[1:], s):
+                    yield s2
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.engine.finder
+
+looks for a finite countermodel of a theory, i.e., a set of facts
+where every axiom holds, but where no goal (or false) axiom can
+be applied. when the prover finds a branch that saturates it has
+found such a model, but most theories which are not valid have
+exists rules which make new constants forever, so the prover
+runs until the timeout:
+
+    true => dom(a).
+    dom(X) => dom(Y), lt(X, Y).
+    lt(X, X) => goal.
+
+the finder works like the prover (@see Prover), but a fresh
+variable may also be given the value of a constant we have
+already, i.e., there is a branch for each constant, and one for a
+new constant as long as we have made less than 'limit' of them.
+the limit grows from 0 to 'bound', like in Mace, so the smallest
+model is found first, here:  dom(a), lt(a, 1), dom(1), lt(1, a)
+
+functions are flattened into fnX predicates which need not be
+functions in a model, so theories with functions are left alone.
+
+most theories we are given are valid, so before the search we let
+the prover try, with at most 'bound' new constants: if it closes
+every branch there is no model to find, and the proof is a lot
+cheaper than showing that no model within the bound exists.
+
+example:
+
+    finder = ModelFinder(theory, 1.0, 3)
+    model = finder.find()
+    if model is not None:
+        print ModelFinder.show(model, finder.symbols)
+
+"""
+
+import time     # timeout
+from no.uio.ifi.bjarneh.cl.engine.prover import Prover, Branch, Closure, \
+                                               Timeout, isVariable, named
+from no.uio.ifi.bjarneh.cl.parse.Parser import Flattener
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='finder.py 0.1'
+
+
+class ModelFinder(Prover):
+    """
+    ModelFinder
+    constants of the theory are their ids, the constants we make
+    are the ints after them (as in the prover), limit is how many
+    we may make, the facts of the model and the time it took (ms)
+    are kept
+    """
+
+    def __init__(self, theory, timeout, bound):
+        Prover.__init__(self, theory, timeout)
+        self.bound = bound
+        self.limit = 0
+        self.constants = set()
+        self.functions = 0
+        self.model = None
+        self.real = 0
+        self.optimized = 0  # theory is not the input (@see Main.frontEnd)
+        predicates = self.symbols.predicates.names
+        for rule in self.rules:
+            for atom in rule.premises + sum(rule.disjuncts, []):
+                if predicates[atom[0] - 1][0].startswith(Flattener.prefix):
+                    self.functions = 1
+                for t in atom[1]:
+                    if not isVariable(t):
+                        self.constants.add(t)
+        self.constants = sorted(self.constants)
+
+    def find(self):
+        """ facts of a countermodel, or None if there is no
+        model within the bound (or we ran out of time) """
+
+        if self.functions:
+            return None
+
+        start = time.time()
+        self.rewrites = 0
+        self.deadline = start + self.timeout
+
+        try:
+            if not self.proved():
+                self.search()
+        except Timeout:
+            pass
+
+        self.real = int((time.time() - start) * 1000)
+        return self.model
+
+    def search(self):
+        """ every branch with at most 'limit' new constants, for
+        limit 0, 1 .. bound, stop at the first model """
+        for limit in range(0, self.bound + 1):
+            self.limit = limit
+            closure = None
+            if self.relations.labels:
+                closure = Closure(self.relations)
+            stack = [ Branch(fresh=self.first, closure=closure,
+                             step=self.step) ]
+            while stack:
+                branch = stack.pop()
+                if not self.close(branch, stack):
+                    self.model = branch.facts
+                    return
+
+    def proved(self):
+        """ true if the prover closes every branch before it
+        has made more than 'bound' constants on any of them """
+
+        closure = None
+        if self.relations.labels:
+            closure = Closure(self.relations)
+        stack = [ Branch(fresh=self.first, closure=closure, step=self.step) ]
+        while stack:
+            branch = stack.pop()
+            while not self.goalMatch(branch):
+                new = self.applyHorns(branch)
+                if self.goalMatch(branch):
+                    break
+                new += self.applyExists(branch)
+                new += self.applySplit(branch, stack)
+                if not new or branch.fresh - self.first > self.bound:
+                    return 0
+        return 1
+
+    def close(self, branch, stack):
+        """ work on branch until goal matches (true) or every
+        axiom holds (false), i.e., we have a model """
+
+        while 1:
+            if self.goalMatch(branch): return 1
+            self.applyHorns(branch)
+            if self.goalMatch(branch): return 1
+            chosen = self.choose(branch, stack)
+            if chosen < 0: return 1 # no model within the limit
+            if not chosen: return 0
+
+    def choose(self, branch, stack):
+        """ the first exists or split rule instance which does not
+        hold, every way to make it hold is a branch of its own,
+        the first one is ours, the others go onto the stack.
+        return 1 if we found one, 0 if every instance holds,
+        and -1 if it cannot hold without going beyond the limit """
+
+        for rule in self.exists + self.splits:
+            self.tick()
+            for s in branch.matches(rule.premises, {}):
+                satisfied = 0
+                for disjunct in rule.disjuncts:
+                    if branch.satisfied(disjunct, s):
+                        satisfied = 1
+                        break
+                if satisfied:
+                    continue
+                choices = []
+                for disjunct in rule.disjuncts:
+                    for (s2, fresh) in self.witnesses(disjunct, s, branch.fresh):
+                        choices.append((disjunct, s2, fresh))
+                if not choices:
+                    return -1
+                for (disjunct, s2, fresh) in reversed(choices[1:]):
+                    other = branch.copy()
+                    other.add(other.instantiate(disjunct, s2))
+                    other.fresh = fresh
+                    stack.append(other)
+                (disjunct, s2, fresh) = choices[0]
+                branch.add(branch.instantiate(disjunct, s2))
+                branch.fresh = fresh
+                self.rewrites += 1
+                return 1
+        return 0
+
+    def witnesses(self, disjunct, subst, fresh):
+        """ all values of the variables of disjunct which are not
+        in subst: constants we have, and new ones up to the limit,
+        yields (subst, next fresh constant) """
+
+        variables = []
+        for (key, args) in disjunct:
+            for t in args:
+                if isVariable(t) and t not in subst and t not in variables:
+                    variables.append(t)
+
+        def assign(i, s, fresh):
+            if i == len(variables):
+                yield (s, fresh)
+                return
+            values = self.constants + range(self.first, fresh)
+            if fresh - self.first < self.limit:
+                values = values + [ fresh ]
+            for v in values:
+                s2 = dict(s)
+                s2[variables[i]] = v
+                if v == fresh:
+                    for choice in assign(i + 1, s2, fresh + 1):
+                        yield choice
+                else:
+                    for choice in assign(i + 1, s2, fresh):
+                        yield choice
+
+        return assign(0, subst, fresh)
+
+    @staticmethod
+    def show(facts, symbols):
+        """ p(a), r(a, 1), ..  sorted by predicate """
+        names = {}  # (name, arity) -> names of the terms
+        for (key, terms) in facts.iteritems():
+            for t in terms:
+                (predicate, values) = named((key, t), symbols)
+                names.setdefault(predicate, []).append(values)
+        atoms = []
+        for ((name, arity), terms) in sorted(names.items()):
+            for t in sorted(terms):
+                if arity:
+                    args = ', '.join([ str(v) for v in t ])
+                    atoms.append("%s(%s)"%(name, args))
+                else:
+                    atoms.append(name)
+        return ', '.join(atoms)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,508 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.engine.prover
+
+a forward chaining prover for geometric logic written in
+Python, it takes the parsed Theory directly, so there is no
+need for temporary files, a Maude process or meta-level
+rewriting. the semantics follow the ObjectLevelRules module
+of the template (@see monologuetemplate.py):
+
+    goal rules    - rules with conclusion 'goal' or 'false',
+                    a branch is closed when one of them matches
+    single/double - rules without disjunction or fresh variables
+                    in the conclusion (applied until nothing new)
+    exists rules  - rules with fresh variables in the conclusion,
+                    new constants are only made if the conclusion
+                    is not already satisfied by the facts (existMatch)
+    split rules   - rules with a disjunctive conclusion, the first
+                    disjunct is added to the current branch, the
+                    others are pushed onto the branch stack,
+                    unless one of them is already satisfied (splitMatch)
+
+single/double rules over binary relations, like symmetry or
+transitivity, are not matched at all, every fact is closed under
+them as it is added to a branch (@see Relations and Closure).
+
+a theory is valid when all branches are closed, if a branch is
+saturated (no rule adds anything new) the theory is not valid.
+function terms are flattened away before we start, exactly as
+for Maude (@see Parser.Flattener).
+
+example:
+
+    theory = Parser().parseTheory('problems/dpe.gl')
+    prover = Prover(theory, 3.0)
+    (status, rewrites, branches) = prover.prove()
+
+"""
+
+import time     # timeout
+
+__author__='bjarneh@ifi.uio.no'
+__version__='prover.py 0.1'
+
+
+def isVariable(t):
+    """ variables are names, constants are ids (@see Rule.atom) """
+    return type(t) is str
+
+
+def named(atom, symbols):
+    """ ((name, arity), terms) of atom, where the constants we
+    made are numbered 1, 2 .. after those of the theory """
+    (key, terms) = atom
+    constants = symbols.constants.names
+    values = []
+    for t in terms:
+        if t <= len(constants):
+            values.append(constants[t - 1])
+        else:
+            values.append(t - len(constants))
+    return (symbols.predicates.names[key - 1], tuple(values))
+
+
+class Rule(object):
+    """
+    Rule
+    an Axiom compiled into premises and disjuncts, each
+    of them a list of atoms:  (predicate, (term, term..))
+    where predicate is the id of (name, arity), and a term is
+    a variable (str) or a constant (int), i.e., the ids of the
+    SymbolTable, which are also the numbers of the Maude module.
+    fresh constants made by the prover are the ints after them,
+    so they can never clash with constants from the input.
+    """
+
+    def __init__(self, axiom, label, symbols):
+        self.label = label
+        self.premises = []
+        self.disjuncts = []
+
+        if not axiom.factAxiom():
+            self.premises = [ Rule.atom(p, symbols) for p in axiom.left ]
+
+        if not axiom.goalAxiom():
+            disjunct = []
+            for p in axiom.right:
+                if p == ';':
+                    self.disjuncts.append(disjunct)
+                    disjunct = []
+                elif p != ',':
+                    disjunct.append(Rule.atom(p, symbols))
+            self.disjuncts.append(disjunct)
+
+        leftvars = {}
+        for (key, args) in self.premises:
+            for t in args:
+                if isVariable(t): leftvars[t] = 1
+
+        self.fresh = 0
+        for disjunct in self.disjuncts:
+            for (key, args) in disjunct:
+                for t in args:
+                    if isVariable(t) and not leftvars.has_key(t):
+                        self.fresh = 1
+
+        # classification, same priority as in the template
+        if axiom.goalAxiom():          self.kind = 'goal'
+        elif len(self.disjuncts) > 1:  self.kind = 'split'
+        elif self.fresh:               self.kind = 'exist'
+        else:                          self.kind = 'horn'
+
+    @staticmethod
+    def atom(predicate, symbols):
+        """ Predicate -> (id of predicate, terms) """
+        terms = []
+        for t in predicate.termlist:
+            if t.ttype == 'VARIABLE':
+                terms.append(t.tvalue)
+            else:
+                terms.append(symbols.constants[t.tvalue])
+        key = symbols.predicates[(predicate.name, len(terms))]
+        return (key, tuple(terms))
+
+    @staticmethod
+    def compile(theory):
+        """ Rules of the flattened theory, labeled 1, 2 .. as
+        in the Maude module, and its SymbolTable """
+        flat = theory.flatten()
+        symbols = flat.getSymbols()
+        rules = []
+        for axiom in flat:
+            rules.append(Rule(axiom, len(rules) + 1, symbols))
+        return (rules, symbols)
+
+    def __str__(self):
+        return 'rule%d'%(self.label)
+
+#______________________________________________________________________________
+
+class Relations(object):
+    """
+    Relations
+    rules over binary relations, which make the facts grow
+    quadratically when they are applied one match at a time:
+
+        converse     e(X, Y) => e(Y, X).            symmetry
+        composition  e(X, Y), re(Y, Z) => re(X, Z).
+                     s(X, Y), s(Y, Z) => s(X, Z).   transitivity
+
+    they are taken out of the rules, and applied by Closure.
+    what to do when an edge  k(a, b)  is added:
+
+        converse[k] = [ k2 ]            add  k2(b, a)
+        left[k]     = [ (k2, k3) ]      for k2(b, z) add  k3(a, z)
+        right[k]    = [ (k1, k3) ]      for k1(x, a) add  k3(x, b)
+
+    keys are the relations we keep successors and predecessors
+    of, labels are the rules we have taken over
+    """
+
+    def __init__(self):
+        self.converse = {}
+        self.left = {}
+        self.right = {}
+        self.keys = set()
+        self.labels = set()
+
+    @staticmethod
+    def find(rules):
+        relations = Relations()
+        for rule in rules:
+            if rule.kind == 'horn' and relations.add(rule):
+                relations.labels.add(rule.label)
+        return relations
+
+    def add(self, rule):
+        """ true if rule is a converse or composition rule """
+
+        if len(rule.disjuncts[0]) != 1:
+            return 0
+        conclusion = rule.disjuncts[0][0]
+        atoms = rule.premises + [ conclusion ]
+        for (key, args) in atoms:
+            if len(args) != 2 or not isVariable(args[0]) \
+               or not isVariable(args[1]) or args[0] == args[1]:
+                return 0
+
+        (k3, (x, z)) = conclusion
+
+        if len(rule.premises) == 1:
+            (k1, args) = rule.premises[0]
+            if args != (z, x):
+                return 0
+            self.converse.setdefault(k1, []).append(k3)
+            self.keys.update([k1, k3])
+            return 1
+
+        if len(rule.premises) == 2:
+            (first, second) = rule.premises
+            if first[1][0] != x:
+                (first, second) = (second, first)
+            (k1, (a, y)) = first
+            (k2, (b, c)) = second
+            if a != x or b != y or c != z or y in (x, z):
+                return 0
+            self.left.setdefault(k1, []).append((k2, k3))
+            self.right.setdefault(k2, []).append((k1, k3))
+            self.keys.update([k1, k2, k3])
+            return 1
+
+        return 0
+
+#______________________________________________________________________________
+
+class Closure(object):
+    """
+    Closure
+    every edge added to a branch is followed along the edges it
+    can be composed with, i.e., a new edge costs the number of
+    edges it meets, not a new cross product of the relations.
+    successors and predecessors of the relations of one branch:
+    succ[key][a] = set([ b, .. ])  and  pred[key][b] = set([ a, .. ])
+    """
+
+    def __init__(self, relations, succ=None, pred=None):
+        self.relations = relations
+        self.succ = succ or {}
+        self.pred = pred or {}
+        for key in relations.keys:
+            self.succ.setdefault(key, {})
+            self.pred.setdefault(key, {})
+
+    def copy(self):
+        succ = {}
+        pred = {}
+        for key in self.relations.keys:
+            succ[key] = dict([ (a, set(targets)) for (a, targets)
+                               in self.succ[key].iteritems() ])
+            pred[key] = dict([ (b, set(sources)) for (b, sources)
+                               in self.pred[key].iteritems() ])
+        return Closure(self.relations, succ, pred)
+
+    def close(self, atoms):
+        """ atoms with everything the relations give, edges
+        we have seen before are left out """
+
+        relations = self.relations
+        work = list(atoms)
+        work.reverse()
+        closed = []
+
+        while work:
+            atom = work.pop()
+            (key, terms) = atom
+            if key not in relations.keys:
+                closed.append(atom)
+                continue
+            (a, b) = terms
+            succ = self.succ[key].setdefault(a, set())
+            if b in succ:
+                continue
+            succ.add(b)
+            self.pred[key].setdefault(b, set()).add(a)
+            closed.append(atom)
+
+            for k2 in relations.converse.get(key, ()):
+                work.append((k2, (b, a)))
+            for (k2, k3) in relations.left.get(key, ()):
+                for z in list(self.succ[k2].get(b, ())):
+                    work.append((k3, (a, z)))
+            for (k1, k3) in relations.right.get(key, ()):
+                for x in list(self.pred[k1].get(a, ())):
+                    work.append((k3, (x, b)))
+
+        return closed
+
+
+#______________________________________________________________________________
+
+class Branch(object):
+    """
+    Branch
+    facts are kept in a dictionary: (name, arity) -> set of terms,
+    fresh is the next fresh constant of this branch (the first
+    is the one after the constants of the theory), closure
+    closes the facts under converse/composition rules (or None),
+    and step is told how many facts a join looks at (or None).
+    """
+
+    def __init__(self, facts=None, fresh=1, closure=None, step=None):
+        self.facts = facts or {}
+        self.fresh = fresh
+        self.closure = closure
+        self.step = step
+
+    def copy(self):
+        facts = {}
+        for (key, terms) in self.facts.iteritems():
+            facts[key] = set(terms)
+        closure = None
+        if self.closure:
+            closure = self.closure.copy()
+        return Branch(facts, self.fresh, closure, self.step)
+
+    def add(self, atoms):
+        """ add ground atoms, return number of new facts """
+        if self.closure:
+            atoms = self.closure.close(atoms)
+        new = 0
+        for (key, terms) in atoms:
+            known = self.facts.setdefault(key, set())
+            if terms not in known:
+                known.add(terms)
+                new += 1
+        return new
+
+    def matches(self, atoms, subst):
+        """ all substitutions extending subst, which turn
+        every atom into a fact of this branch """
+        if not atoms:
+            yield subst
+            return
+        (key, args) = atoms[0]
+        candidates = self.facts.get(key, ())
+        if self.step:
+            self.step(len(candidates))
+        for terms in candidates:
+            s = Branch.unify(args, terms, subst)
+            if s is not None:
+                for s2 in self.matches(atoms[1:], s):
+                    yield s2
+
+    def satisfied(self, atoms, subst):
+        """ true if atoms can be matched (existMatch) """
+        for s in self.matches(atoms, subst):
+            return 1
+        return 0
+
+    def instantiate(self, atoms, subst):
+        """ apply substitution, unbound variables get fresh constants"""
+        subst = dict(subst)
+        ground = []
+        for (key, args) in atoms:
+            terms = []
+            for t in args:
+                if isVariable(t):
+                    if not subst.has_key(t):
+                        subst[t] = self.fresh
+                        self.fresh += 1
+                    terms.append(subst[t])
+                else:
+                    terms.append(t)
+            ground.append((key, tuple(terms)))
+        return ground
+
+    @staticmethod
+    def unify(args, terms, subst):
+        """ match pattern args with ground terms """
+        s = subst
+        for i in range(0, len(args)):
+            a = args[i]
+            if type(a) is str: # isVariable, without a call
+                if s.has_key(a):
+                    if s[a] != terms[i]: return None
+                else:
+                    if s is subst: s = dict(subst)
+                    s[a] = terms[i]
+            elif a != terms[i]:
+                return None
+        return s
+
+#______________________________________________________________________________
+
+class Timeout(Exception):
+    pass
+
+#______________________________________________________________________________
+
+class Prover(object):
+    """
+    Prover
+    each round on a branch does: goal check, single/double rules
+    until nothing new, all exists rules which are not satisfied,
+    and the first split rule which is not satisfied. this way
+    splits are not starved by exists rules that never end.
+    """
+
+    def __init__(self, theory, timeout):
+        self.timeout = timeout
+        (self.rules, self.symbols) = Rule.compile(theory)
+        self.first = len(self.symbols.constants.names) + 1 # fresh constant
+        self.relations = Relations.find(self.rules)
+        self.goals  = [ r for r in self.rules if r.kind == 'goal' ]
+        self.horns  = [ r for r in self.rules if r.kind == 'horn'
+                        and r.label not in self.relations.labels ]
+        self.exists = [ r for r in self.rules if r.kind == 'exist' ]
+        self.splits = [ r for r in self.rules if r.kind == 'split' ]
+        self.rewrites = 0
+        self.deadline = None
+        self.work = 0
+
+    def prove(self):
+        """ return (status, rewrites, branches), where status
+        is one of: valid, saturated, timeout"""
+
+        self.rewrites = 0
+        self.deadline = time.time() + self.timeout
+        closure = None
+        if self.relations.labels:
+            closure = Closure(self.relations)
+        stack = [ Branch(fresh=self.first, closure=closure, step=self.step) ]
+        branches = 0
+
+        try:
+            while stack:
+                branch = stack.pop()
+                branches += 1
+                if not self.close(branch, stack):
+                    return ('saturated', self.rewrites, branches)
+        except Timeout:
+            return ('timeout', self.rewrites, branches)
+
+        return ('valid', self.rewrites, branches)
+
+    def close(self, branch, stack):
+        """ work on branch until goal matches (true) or
+        nothing new can be added (false) """
+
+        while 1:
+            if self.goalMatch(branch): return 1
+            new = self.applyHorns(branch)
+            if self.goalMatch(branch): return 1
+            new += self.applyExists(branch)
+            new += self.applySplit(branch, stack)
+            if not new: return 0
+
+    def tick(self):
+        if time.time() > self.deadline:
+            raise Timeout()
+
+    def step(self, facts):
+        """ a join looks at facts, the clock is read each time
+        about 4096 facts have been looked at (@see Branch.matches) """
+        self.work += facts + 1
+        if self.work > 4096:
+            self.work = 0
+            self.tick()
+
+    def goalMatch(self, branch):
+        for rule in self.goals:
+            if branch.satisfied(rule.premises, {}):
+                self.rewrites += 1
+                return 1
+        return 0
+
+    def applyHorns(self, branch):
+        """ single and double rules until nothing new """
+        total = 0
+        while 1:
+            self.tick()
+            conclusions = []
+            for rule in self.horns:
+                for s in branch.matches(rule.premises, {}):
+                    conclusions += branch.instantiate(rule.disjuncts[0], s)
+            new = branch.add(conclusions)
+            self.rewrites += new
+            total += new
+            if not new: return total
+
+    def applyExists(self, branch):
+        """ every exists rule instance which is not satisfied """
+        new = 0
+        for rule in self.exists:
+            self.tick()
+            for s in list(branch.matches(rule.premises, {})):
+                if not branch.satisfied(rule.disjuncts[0], s):
+                    branch.add(branch.instantiate(rule.disjuncts[0], s))
+                    self.rewrites += 1
+                    new += 1
+        return new
+
+    def applySplit(self, branch, stack):
+        """ the first split rule instance where no disjunct is
+        satisfied, the other disjuncts are pushed onto the stack"""
+        for rule in self.splits:
+            self.tick()
+            for s in branch.matches(rule.premises, {}):
+                satisfied = 0
+                for disjunct in rule.disjuncts:
+                    if branch.satisfied(disjunct, s):
+                        satisfied = 1
+                        break
+                if not satisfied:
+                    # last disjunct at the bottom, first one is ours
+                    for disjunct in reversed(rule.disjuncts[1:]):
+                        other = branch.copy()
+                        other.add(other.instantiate(disjunct, s))
+                        stack.append(other)
+                    branch.add(branch.instantiate(rule.disjuncts[0], s))
+                    self.rewrites += 1
+                    return 1
+        return 0
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.engine.sat
+
+proves a theory by grounding it over a bounded domain, and giving
+the ground rules to a SAT solver (@see engine.cdcl) as clauses:
+
+    dom(X) => p(X) ; q(X)       with X = a:   -dom(a) v p(a) v q(a)
+    p(X), q(X) => goal          with X = a:   -p(a) v -q(a)
+
+a disjunct with more than one atom gets a variable of its own,
+which implies each of the atoms. the prover learns a clause from
+each conflict, so a reason for closing one branch is never found
+again on another, which the branch stack of Maude cannot avoid.
+
+a fresh variable in the conclusion is given a value in two ways:
+
+    refute   - a Skolem term, i.e., a new constant for each rule,
+               disjunct, variable and value of the premises, made
+               from terms no deeper than 'depth'. a rule instance
+               which needs a deeper term is left out, which only
+               makes it easier to satisfy the clauses, so when they
+               cannot be satisfied the theory is valid
+    model    - any constant of the theory, or one of 'depth' new
+               ones, when the clauses can be satisfied this is a
+               finite countermodel
+
+for depth 0, 1, .. (until we run out of time) we first refute,
+then, while depth is not above 'bound', look for a model.
+only rule instances where the premises may be true are made, i.e.,
+the atoms we get from the facts when every disjunct of every rule
+is added (this is also how a refutation which left nothing out
+gives a countermodel). functions are flattened into fnX predicates
+which need not be functions in a model, so for theories with
+functions we only look for a refutation (@see finder).
+
+example:
+
+    prover = SatProver(theory, 3.0, 3)
+    (status, model) = prover.prove()
+
+"""
+
+import time     # timeout
+import itertools # values of fresh variables
+from no.uio.ifi.bjarneh.cl.engine.prover import Rule, Timeout, isVariable
+from no.uio.ifi.bjarneh.cl.engine.datalog import Datalog
+from no.uio.ifi.bjarneh.cl.engine.cdcl import Solver
+from no.uio.ifi.bjarneh.cl.parse.Parser import Theory, Flattener
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='sat.py 0.1'
+
+
+class SatProver(object):
+    """
+    SatProver
+    a Skolem term is a tuple:  ('sk', depth, label, disjunct,
+    variable, values)  where values are those of the premise
+    variables found in the disjunct, the constants of the theory
+    are their ids, the new constants of a model the ints after
+    them (@see Rule), and scope is:
+    (label, disjunct) -> (premise variables, fresh variables)
+    """
+
+    def __init__(self, theory, timeout, bound):
+        self.timeout = timeout
+        self.bound = bound
+        (self.rules, self.symbols) = Rule.compile(theory)
+        self.first = len(self.symbols.constants.names) + 1 # new constant
+        self.compiled = {}  # key of premise -> [ (first, rest, rule) ]
+        self.scope = {}
+        self.constants = set()
+        self.functions = 0
+        predicates = self.symbols.predicates.names
+        for rule in self.rules:
+            for i in range(len(rule.premises)):
+                (first, rest) = Datalog.compile(rule.premises, i)
+                self.compiled.setdefault(rule.premises[i][0], []).append(
+                                                        (first, rest, rule))
+            for j in range(len(rule.disjuncts)):
+                self.scope[(rule.label, j)] = SatProver.variables(rule, j)
+            for (key, args) in rule.premises + sum(rule.disjuncts, []):
+                if predicates[key - 1][0].startswith(Flattener.prefix):
+                    self.functions = 1
+                for t in args:
+                    if not isVariable(t):
+                        self.constants.add(t)
+        self.constants = sorted(self.constants)
+        self.clauses = 0
+        self.conflicts = 0
+        self.deadline = None
+        self.optimized = 0  # theory is not the input (@see Main.frontEnd)
+
+    def prove(self):
+        """ return (status, model), where status is one of: valid,
+        countersatisfiable, unknown (a model which may not be one,
+        since fnX need not be functions) or timeout, and model the
+        facts of a countermodel or None """
+
+        self.deadline = time.time() + self.timeout
+
+        try:
+            depth = 0
+            while 1:
+                (satisfied, left, model) = self.solve(self.skolem, depth)
+                if not satisfied:
+                    return ('valid', None)
+                if not left:
+                    if self.functions:
+                        return ('unknown', None)
+                    return ('countersatisfiable', model)
+                if depth <= self.bound and not self.functions:
+                    (satisfied, left, model) = self.solve(self.domain, depth)
+                    if satisfied:
+                        return ('countersatisfiable', model)
+                depth += 1
+        except Timeout:
+            return ('timeout', None)
+
+    def tick(self):
+        if time.time() > self.deadline:
+            raise Timeout()
+
+    def skolem(self, rule, j, subst, bound):
+        """ the Skolem values of the fresh variables of disjunct
+        j, None if they would be deeper than bound """
+        (shared, fresh) = self.scope[(rule.label, j)]
+        if not fresh:
+            return [ subst ]
+        values = tuple([ subst[v] for v in shared ])
+        depth = 1
+        for t in values:
+            if type(t) is tuple and t[1] >= depth:
+                depth = t[1] + 1
+        if depth > bound:
+            return None
+        s = dict(subst)
+        for v in fresh:
+            s[v] = ('sk', depth, rule.label, j, v, values)
+        return [ s ]
+
+    def domain(self, rule, j, subst, bound):
+        """ every value of the fresh variables of disjunct j
+        among the constants and bound new ones """
+        (shared, fresh) = self.scope[(rule.label, j)]
+        if not fresh:
+            return [ subst ]
+        values = self.constants + range(self.first, self.first + bound)
+        substs = []
+        for combination in itertools.product(values, repeat=len(fresh)):
+            s = dict(subst)
+            s.update(zip(fresh, combination))
+            substs.append(s)
+        return substs
+
+    @staticmethod
+    def variables(rule, j):
+        """ variables of disjunct j found in the premises (sorted),
+        and the others, i.e., the fresh ones (in order) """
+        premises = set()
+        for (key, args) in rule.premises:
+            premises.update([ t for t in args if isVariable(t) ])
+        shared = set()
+        fresh = []
+        for (key, args) in rule.disjuncts[j]:
+            for t in args:
+                if not isVariable(t):
+                    continue
+                if t in premises:
+                    shared.add(t)
+                elif t not in fresh:
+                    fresh.append(t)
+        return (sorted(shared), fresh)
+
+    def ground(self, witness, bound):
+        """ rule instances (rule, subst, [ [ subst ] per disjunct ])
+        where the premises may be true, and left tells if some
+        were left out since witness gave None """
+
+        possible = Datalog(Theory()) # no rules, only the index
+        instances = []
+        left = 0
+        seen = set()
+        delta = []
+
+        def instance(rule, s):
+            key = (rule.label, tuple(sorted(s.items())))
+            if key in seen:
+                return 0
+            seen.add(key)
+            witnesses = []
+            for j in range(len(rule.disjuncts)):
+                w = witness(rule, j, s, bound)
+                if w is None:
+                    return 1
+                witnesses.append(w)
+            instances.append((rule, s, witnesses))
+            for j in range(len(rule.disjuncts)):
+                for w in witnesses[j]:
+                    for (k, args) in rule.disjuncts[j]:
+                        delta.append((k, tuple([ w.get(t, t) for t in args ])))
+            return 0
+
+        for rule in self.rules:
+            if not rule.premises:
+                left |= instance(rule, {})
+
+        delta = possible.add(delta)
+
+        while delta:
+            new = delta
+            delta = []
+            for (key, terms) in new:
+                self.tick()
+                for (first, rest, rule) in self.compiled.get(key, ()):
+                    s = Datalog.unify(first, terms, {})
+                    if s is None:
+                        continue
+                    for s2 in possible.matches(rest, s):
+                        left |= instance(rule, s2)
+            delta = possible.add(delta)
+
+        return (instances, left)
+
+    def solve(self, witness, bound):
+        """ (satisfied, left, model) of the grounding """
+
+        (instances, left) = self.ground(witness, bound)
+
+        solver = Solver()
+        atoms = {}
+
+        def variable(key, args):
+            atom = (key, args)
+            if not atoms.has_key(atom):
+                atoms[atom] = solver.newVar()
+            return atoms[atom]
+
+        def literal(disjunct, s):
+            if len(disjunct) == 1:
+                (key, args) = disjunct[0]
+                return variable(key, tuple([ s.get(t, t) for t in args ]))
+            aux = solver.newVar()
+            for (key, args) in disjunct:
+                atom = variable(key, tuple([ s.get(t, t) for t in args ]))
+                solver.addClause([ -aux, atom ])
+            return aux
+
+        for (rule, s, witnesses) in instances:
+            clause = []
+            for (key, args) in rule.premises:
+                clause.append(-variable(key, tuple([ s.get(t, t) for t in args ])))
+            for j in range(len(rule.disjuncts)):
+                for w in witnesses[j]:
+                    clause.append(literal(rule.disjuncts[j], w))
+            solver.addClause(clause)
+            self.clauses += 1
+
+        remaining = None
+        if self.deadline:
+            remaining = max(self.deadline - time.time(), 0.0)
+        satisfied = solver.solve(remaining)
+        self.conflicts += solver.conflicts
+
+        model = None
+        if satisfied:
+            model = {}
+            names = {}
+            for ((key, args), v) in atoms.iteritems():
+                if solver.model[v]:
+                    args = tuple([ self.name(t, names) for t in args ])
+                    model.setdefault(key, set()).add(args)
+
+        return (satisfied, left, model)
+
+    def name(self, t, names):
+        """ Skolem terms become new constants: 1, 2 .. after
+        the constants of the theory """
+        if type(t) is not tuple:
+            return t
+        if not names.has_key(t):
+            names[t] = self.first + len(names)
+        return names[t]
+
+
+if __name__ == '__main__':
+    pass
@@ -11,11 +11,38 @@ it to a Maude module and proving theorems hopefully..
 import sys      # command line arguments and output
 import os       # needed by 'Main.which' and pathwalk
 import re       # regular expressions
+import time     # wall time of the python engine
 import tempfile # needed to construct temporary files for Maude modules
+import multiprocessing # prove many input files at once (--jobs)
+import signal   # stop Maude when the --jobs pool is terminated
+import threading # read the next input files while we prove (--queue)
+import Queue     # files which are read, but not proved yet
+try:
+    import json
+except ImportError:
+    import simplejson as json
+try:
+    from collections import OrderedDict
+except ImportError:
+    OrderedDict = dict
+from multiprocessing.util import Finalize
+from StringIO import StringIO
 from no.uio.ifi.bjarneh.parse.cmdline import GetOpt      # parse sys.argv
-from no.uio.ifi.bjarneh.cl.parse.Parser import Parser    # parse theory
+from no.uio.ifi.bjarneh.cl.parse.Parser import Parser, ParseError
+from no.uio.ifi.bjarneh.cl.parse import Binary           # compiled theories
 from no.uio.ifi.bjarneh.cl.template.filler import Filler 
 from no.uio.ifi.bjarneh.util.subprocess import SubProcess
+from no.uio.ifi.bjarneh.txt.hashbar import HashBar
+from no.uio.ifi.bjarneh.cl.pool import MaudePool
+from no.uio.ifi.bjarneh.cl.engine.prover import Prover
+from no.uio.ifi.bjarneh.cl.engine.datalog import Datalog
+from no.uio.ifi.bjarneh.cl.engine.finder import ModelFinder
+from no.uio.ifi.bjarneh.cl.engine.sat import SatProver
+from no.uio.ifi.bjarneh.cl.optimize.slicing import Slicer
+from no.uio.ifi.bjarneh.cl.optimize.simplify import Simplifier
+from no.uio.ifi.bjarneh.cl.optimize.saturate import Saturator
+from no.uio.ifi.bjarneh.cl.cache import ResultCache, TheoryCache
+from no.uio.ifi.bjarneh.cl.result import ProofResult
 
 
 __author__='bjarneh@ifi.uio.no'
@@ -27,9 +54,12 @@ class Main(object):
     monologue - theorem prover for geometric logic
 
     usage: monologue [OPTIONS] somefile.gl
+           monologue compile [OPTIONS] somefile.gl -o somefile.glb
 
     Maude version >= 2.4 is required for this to work
     if '-' is given as input file stdin will be read
+    compile writes parsed theories which load without
+    parsing, to somefile.glb unless -o is given
     all boolean options default to false, and options
     which require a value have their default written
     inside [ brackets ] after the explanation
@@ -39,13 +69,22 @@ class Main(object):
     -h  --help              print this menu and exit
     -v  --version           print version and exit
     -d  --dump              dump Maude module to output        
+    -s  --check             report all syntax errors, no proofs
     -r  --recursive         investigate recursively
     -p  --print             turn on Maude print statements
     -n  --no-escape         turn off escape sequences     
+    -k  --keep-alive        keep Maude alive between problems
+    -a  --all-axioms        keep axioms the goal does not need
+    -j  --jobs              prove this many files at once     [          1 ]
+    -q  --queue             Maude files read ahead, 0 is off  [          2 ]
     -l  --level             how deep in terms of iterations   [        100 ]
     -t  --timeout           timeout value in seconds          [        3.0 ]
+    -b  --bound             countermodel size, 0 turns it off [          3 ]
     -o  --output            where to send output              [ sys.stdout ]
     -m  --maude             specify another Maude location    [       NULL ]
+    -e  --engine            prove with: maude | python | sat  [      maude ]
+    -c  --cache             cache proofs and parsed theories  [       NULL ]
+    -f  --format            output format: text | json        [       text ]
     
     """
     
@@ -60,10 +99,22 @@ class Main(object):
     defaults['dump']        = 0
     defaults['Maude']       = "maude"
     defaults['input']       = []
+    defaults['keep']        = 0
+    defaults['jobs']        = 1
+    defaults['queue']       = 2
+    defaults['engine']      = 'maude'
+    defaults['cache']       = None
+    defaults['format']      = 'text'
+    defaults['slice']       = 1
+    defaults['bound']       = 3
 
 
     def __init__(self, argv):
         """ parse input arguments, and start up"""
+        self.pool = None
+        self.cache = None
+        self.theoryCache = None
+        self.maudeVersion = None
         self.parseArgv(argv)
         self.start()
 
@@ -83,6 +134,9 @@ class Main(object):
         getopt.add_bool_option(['-p', '--print', '-print'])
         getopt.add_bool_option(['-n', '--no-escape', '-no-escape'])
         getopt.add_bool_option(['-r','--recursive','-recursive'])
+        getopt.add_bool_option(['-k','--keep-alive','-keep-alive'])
+        getopt.add_bool_option(['-s','--check','-check'])
+        getopt.add_bool_option(['-a','--all-axioms','-all-axioms'])
         getopt.add_str_option( ['-l', '-level', '--level','--level=', '-timeout='], 
                               test=(lambda x : re.match(r"^\d+$", x) and int(x) < 1000),
                               errormsg=" -level: must be number in range [1,1000]")
@@ -90,8 +144,24 @@ class Main(object):
                                '-timeout=','--timeout='], 
                               test=lambda x : re.match(r"^\d*\.?\d+$", x) ,
                               errormsg=" -timeout: value must be number ")
+        getopt.add_str_option( ['-j', '-jobs', '--jobs', '-jobs=', '--jobs='],
+                              test=lambda x : re.match(r"^[1-9]\d*$", x),
+                              errormsg=" -jobs: must be a positive number")
+        getopt.add_str_option( ['-q', '-queue', '--queue', '-queue=', '--queue='],
+                              test=lambda x : re.match(r"^\d+$", x),
+                              errormsg=" -queue: must be a number")
+        getopt.add_str_option( ['-b', '-bound', '--bound', '-bound=', '--bound='],
+                              test=lambda x : re.match(r"^\d+$", x),
+                              errormsg=" -bound: must be a number")
         getopt.add_str_option( ['-o','--output','-output','-output=','--output='])
         getopt.add_str_option( ['-m','--maude','-maude','-maude=','--maude='])
+        getopt.add_str_option( ['-e','--engine','-engine','-engine=','--engine='],
+                              test=lambda x : x in ['maude', 'python', 'sat'],
+                              errormsg=" -engine: must be 'maude', 'python' or 'sat'")
+        getopt.add_str_option( ['-c','--cache','-cache','-cache=','--cache='])
+        getopt.add_str_option( ['-f','--format','-format','-format=','--format='],
+                              test=lambda x : x in ['text', 'json'],
+                              errormsg=" -format: must be 'text' or 'json'")
 
         try:
             (opts, args) = getopt.parse(argv)
@@ -111,6 +181,20 @@ class Main(object):
         if('-n' in keys):   self.defaults['escape']    = 0
         if('-r' in keys):   self.defaults['recursive'] = 1
         if('-m' in keys):   self.defaults['Maude']     = opts['-m'][0]
+        if('-k' in keys):   self.defaults['keep']      = 1
+        if('-j' in keys):   self.defaults['jobs']      = int(opts['-j'][0])
+        if('-q' in keys):   self.defaults['queue']     = int(opts['-q'][0])
+        if('-e' in keys):   self.defaults['engine']    = opts['-e'][0]
+        if('-c' in keys):   self.defaults['cache']     = opts['-c'][0]
+        if('-f' in keys):   self.defaults['format']    = opts['-f'][0]
+        if('-a' in keys):   self.defaults['slice']     = 0
+        if('-b' in keys):   self.defaults['bound']     = int(opts['-b'][0])
+        if('-s' in keys and self.defaults['mode'] == 'PROVEINPUT'):
+            self.defaults['mode'] = 'CHECK'
+
+        if args and args[0] == 'compile' and self.defaults['mode'] == 'PROVEINPUT':
+            self.defaults['mode'] = 'COMPILE'
+            args = args[1:]
 
         self.sanityCheck()
                                      
@@ -125,6 +209,23 @@ class Main(object):
         # with print statements we don't want hashbar as well
         if self.defaults['print'] and self.defaults['escape']:
             self.defaults['escape'] = 0
+        # print statements need the predicates inside ObjectLevelRules,
+        # which the prelude of a long-lived Maude process lacks
+        if self.defaults['print'] and self.defaults['keep']:
+            self.defaults['keep'] = 0
+        # hashbar would end up in the middle of our JSON
+        if self.defaults['format'] == 'json' and self.defaults['escape']:
+            self.defaults['escape'] = 0
+        # several hashbars on top of each other is no good
+        if self.defaults['jobs'] > 1 and self.defaults['escape']:
+            self.defaults['escape'] = 0
+        # the python and sat engines prove in this process, where the
+        # thread which reads ahead would take turns with the proof
+        if self.defaults['engine'] != 'maude':
+            self.defaults['queue'] = 0
+        # a directory can only be checked by walking through it
+        if self.defaults['mode'] == 'CHECK':
+            self.defaults['recursive'] = 1
 
 
     def start(self):
@@ -133,6 +234,8 @@ class Main(object):
         mode = self.defaults['mode']
 
         if  (mode == 'PROVEINPUT'):  self.inputLoop()
+        elif(mode == 'COMPILE'):     self.compileLoop()
+        elif(mode == 'CHECK'):       self.checkLoop()
         elif(mode == 'HELP'):        self.help()
         elif(mode == 'VERSION'):     self.version()
 
@@ -142,28 +245,373 @@ class Main(object):
     def inputLoop(self):
         """ traverse all input files/directories and try to prove them"""
 
-        for inputfile in self.defaults['input']:
-            if self.defaults['recursive'] and os.path.isdir(inputfile) :
-                os.path.walk(inputfile, self.walker, None)
-            else:
-                self.parseAndProve(inputfile)
+        status = 0
+
+        if self.defaults['jobs'] > 1:
+            status = self.jobLoop()
+        elif self.defaults['queue'] > 0:
+            self.pipeLoop()
+        else:
+            for inputfile in self.defaults['input']:
+                if self.defaults['recursive'] and os.path.isdir(inputfile) :
+                    os.path.walk(inputfile, self.walker, None)
+                else:
+                    self.parseAndProve(inputfile)
+
+        if self.pool:
+            self.pool.close()
+
+        # the pool processes used the cache, we clean it up
+        if self.defaults['jobs'] > 1 and self.defaults['cache']:
+            self.cache = ResultCache(self.defaults['cache'])
+
+        # parsed theories are below the directory of the results
+        if self.cache:
+            self.cache.evict()
+        elif self.theoryCache:
+            self.theoryCache.evict()
 
         if not self.defaults['output'] == sys.stdout:
             self.defaults['output'].close()
 
+        sys.exit(status)
+
+
+    def compileLoop(self):
+        """ parse input files and write them as compiled theories,
+        each next to its input file, or all of them to -o"""
+
+        inputfiles = [ f for f in self.inputFiles()
+                       if not Binary.isBinary(f) ]
+        output = self.defaults['output']
+
+        if output == sys.stdout:
+            if '-' in inputfiles:
+                sys.stderr.write("[ERROR] compile: stdin requires -output\n")
+                sys.exit(1)
+        elif len(inputfiles) != 1:
+            sys.stderr.write("[ERROR] compile: -output requires "
+                             "a single input file\n")
+            sys.exit(1)
+
+        for inputfile in inputfiles:
+            parser = Parser()
+            theory = parser.parseTheory(inputfile).flatten()
+            if output == sys.stdout:
+                fh = open(os.path.splitext(inputfile)[0] + Binary.suffix, 'wb')
+                fh.write(Binary.dumps(theory))
+                fh.close()
+            else:
+                output.write(Binary.dumps(theory))
+
+        if not output == sys.stdout:
+            output.close()
+
         sys.exit(0)
 
 
-    def parseAndProve(self, inputfile):
-        """ hopefully the name says it all.. """
+    def checkLoop(self):
+        """ parse all input files in this process, and report every
+        syntax error as  file:line:column: message  (or as JSON),
+        only .gl files are checked below a directory"""
 
-        mm = self.getMaudeModule(inputfile)
-        if self.defaults['dump']:
-            if self.defaults['print']:
-                mm = self.removePrintComments(mm)
-            self.defaults['output'].write(mm)
+        output = self.defaults['output']
+        checked = 0
+        errors = 0
+
+        for inputfile in self.inputFiles('.gl'):
+            if Binary.isBinary(inputfile):
+                continue
+            checked += 1
+            parser = Parser()
+            for (fname, line, column, msg) in parser.checkTheory(inputfile):
+                errors += 1
+                if self.defaults['format'] == 'json':
+                    d = OrderedDict()
+                    d['file']    = fname
+                    d['line']    = line
+                    d['column']  = column
+                    d['message'] = msg
+                    output.write(json.dumps(d) + '\n')
+                else:
+                    output.write("%s:%d:%d: %s\n"%(fname, line, column, msg))
+
+        if self.defaults['format'] == 'text':
+            output.write("checked %d files, %d errors\n"%(checked, errors))
+
+        if not output == sys.stdout:
+            output.close()
+
+        if errors:
+            sys.exit(1)
+        sys.exit(0)
+
+
+    def jobLoop(self):
+        """ prove input files in a pool of processes, output is
+        written in the same order as a serial run would write it,
+        and we stop at the first file a serial run would stop at,
+        return the exit status of that file (0 if none)"""
+
+        inputfiles = self.inputFiles()
+
+        # stdin is closed in the pool processes
+        stdin = None
+        if '-' in inputfiles:
+            stdin = sys.stdin.read()
+
+        defaults = dict(self.defaults)
+        del defaults['output']
+
+        jobs = multiprocessing.Pool(self.defaults['jobs'],
+                                    initJob,
+                                    (defaults, stdin))
+
+        status = 0
+
+        for (output, status) in jobs.imap(proveJob, inputfiles):
+            self.defaults['output'].write(output)
+            if status:
+                break
+
+        if status:
+            # the workers stop their Maude processes (@see stopJob)
+            jobs.terminate()
         else:
-            self.prove(mm)
+            jobs.close()
+        jobs.join()
+
+        return status
+
+
+    def pipeLoop(self):
+        """ prove input files one at a time, while a thread reads
+        them and fills the Maude modules (frontEnd) at most 'queue'
+        files ahead of us. the thread is quiet, a file it fails to
+        read is read again here, where errors are reported in order"""
+
+        inputfiles = self.inputFiles()
+        ready = Queue.Queue(self.defaults['queue'])
+
+        producer = threading.Thread(target=self.producer,
+                                    args=(inputfiles, ready))
+        producer.setDaemon(1) # do not wait for it if we exit early
+        producer.start()
+
+        for inputfile in inputfiles:
+            self.parseAndProve(inputfile, ready.get())
+
+
+    def producer(self, inputfiles, ready):
+        """ put the frontEnd of each input file into ready, or None
+        if it must be done again by the one who proves it """
+        for inputfile in inputfiles:
+            prepared = None
+            if inputfile != '-': # stdin can only be read once
+                try:
+                    prepared = self.frontEnd(inputfile, quiet=1)
+                except (Exception, SystemExit):
+                    prepared = None
+            ready.put(prepared)
+
+
+    def inputFiles(self, suffix=None):
+        """ list of input files, in the order inputLoop visits them,
+        files found below a directory must end with suffix if given"""
+        inputfiles = []
+        for inputfile in self.defaults['input']:
+            if self.defaults['recursive'] and os.path.isdir(inputfile) :
+                found = []
+                os.path.walk(inputfile, self.collector, found)
+                if suffix:
+                    found = [ f for f in found if f.endswith(suffix) ]
+                inputfiles.extend(found)
+            else:
+                inputfiles.append(inputfile)
+        return inputfiles
+
+
+    def parseAndProve(self, inputfile, prepared=None):
+        """ hopefully the name says it all.. prepared is what
+        frontEnd returns, if it has been done in advance """
+
+        start = time.time()
+
+        self.writeHeader(inputfile)
+
+        if prepared is None:
+            prepared = self.frontEnd(inputfile)
+
+        (frontend, timeout) = prepared
+
+        if isinstance(frontend, Datalog):
+            result = self.datalogProve(frontend)
+        elif isinstance(frontend, ModelFinder):
+            result = self.countermodel(frontend)
+        elif isinstance(frontend, SatProver):
+            result = self.satProve(frontend)
+        elif self.defaults['engine'] == 'python' and not self.defaults['dump']:
+            result = self.pythonProve(frontend, timeout)
+        else:
+            mm = frontend
+            if self.defaults['dump']:
+                if self.defaults['print']:
+                    mm = self.removePrintComments(mm)
+                self.defaults['output'].write(mm)
+                return
+            elif self.defaults['cache'] and not self.defaults['print']:
+                result = self.cachedProve(mm, timeout)
+            else:
+                result = self.prove(mm, timeout=timeout)
+
+        result.inputfile = inputfile
+        result.wall = int((time.time() - start) * 1000)
+
+        if self.defaults['format'] == 'json':
+            self.defaults['output'].write(result.toJSON() + '\n')
+
+
+    def frontEnd(self, inputfile, quiet=0):
+        """ everything we do before the proof, returns (frontend,
+        timeout), where frontend is the theory for the python engine
+        or a Maude module, and timeout the seconds left for the proof.
+        when quiet errors are raised instead of reported (@see
+        getTheory). a theory which needs no search is given to the
+        Datalog engine instead, and if a countermodel is found there
+        is nothing to prove, the sat engine looks for countermodels
+        itself. with a cache the Maude module is made first, if its
+        result is cached the finder is not run. a model is one of the
+        theory after optimize, and it is marked if that is not the
+        input theory """
+
+        timeout = self.defaults['timeout']
+
+        if self.defaults['dump']:
+            return (self.getMaudeModule(inputfile, quiet), timeout)
+
+        report = []
+        original = self.getTheory(inputfile, quiet)
+        theory = self.optimize(original, report)
+
+        if Datalog.horn(theory):
+            return (Datalog(theory), timeout)
+
+        if self.defaults['engine'] == 'sat':
+            sat = SatProver(theory, timeout, self.defaults['bound'])
+            sat.optimized = Main.optimized(original, theory)
+            return (sat, timeout)
+
+        # a result in the cache is found before the finder runs,
+        # the module is needed for the key
+        module = None
+        cached = (self.defaults['engine'] != 'python' and
+                  self.defaults['cache'] and not self.defaults['print'])
+        if cached:
+            start = time.time()
+            module = self.fillTemplate(theory, report, timeout)
+            timeout = max(timeout - (time.time() - start), 0.0)
+            if self.cachedResult(module)[1] is not None:
+                return (module, timeout)
+
+        if self.defaults['bound']:
+            # at most a quarter of the time, the rest is for the proof
+            start = time.time()
+            finder = ModelFinder(theory, timeout / 4,
+                                 self.defaults['bound'])
+            if finder.find() is not None:
+                finder.optimized = Main.optimized(original, theory)
+                return (finder, timeout)
+            timeout = max(timeout - (time.time() - start), 0.0)
+
+        if self.defaults['engine'] == 'python':
+            return (theory, timeout)
+
+        if module is None:
+            # saturation is part of the time we have, like the finder
+            start = time.time()
+            module = self.fillTemplate(theory, report, timeout)
+            timeout = max(timeout - (time.time() - start), 0.0)
+        return (module, timeout)
+
+
+    @staticmethod
+    def optimized(original, theory):
+        """ true if optimize changed the theory """
+        return str(original.flatten()) != str(theory)
+
+
+    def writeHeader(self, inputfile):
+        """ name of input file before the proof """
+        if not self.defaults['dump'] and self.defaults['format'] == 'text':
+            if inputfile == '-':
+                self.defaults['output'].write("input file  :  stdin\n")
+            else:
+                bname = os.path.basename(inputfile)
+                self.defaults['output'].write("input file  :  %s\n"%(bname))
+
+
+    def textOutput(self):
+        """ where text from the provers go, with --format json
+        it is thrown away since we only want one record per file"""
+        if self.defaults['format'] == 'json':
+            return StringIO()
+        return self.defaults['output']
+
+
+    def cachedProve(self, MaudeModule, timeout):
+        """ look for the result in the cache before we try to
+        prove anything, print statements are never cached, and
+        neither are timeouts and errors, they are tried again"""
+
+        (key, text) = self.cachedResult(MaudeModule)
+        cached = 1
+
+        if text is None:
+            output = StringIO()
+            self.prove(MaudeModule, output, timeout)
+            text = output.getvalue()
+            if ResultCache.decided(text):
+                self.cache.put(key, text)
+            cached = 0
+
+        self.textOutput().write(text)
+
+        result = ProofResult.fromMaude(text)
+        result.cached = cached
+        return result
+
+
+    def cachedResult(self, MaudeModule):
+        """ (key, text) where text is the decided result in
+        the cache for MaudeModule, or None """
+
+        if not self.cache:
+            self.cache = ResultCache(self.defaults['cache'])
+
+        key = ResultCache.key(MaudeModule,
+                              self.defaults['level'],
+                              self.defaults['timeout'],
+                              self.getMaudeVersion())
+
+        text = self.cache.get(key)
+
+        # entries written before only decided results were kept
+        if text is not None and not ResultCache.decided(text):
+            text = None
+
+        return (key, text)
+
+
+    def getMaudeVersion(self):
+        """ Maude version is part of the cache key """
+        if self.maudeVersion is None:
+            whichMaude = Main.which(self.defaults['Maude'])
+            self.maudeVersion = ''
+            if whichMaude:
+                version = SubProcess.spoof(whichMaude + " --version")
+                if version:
+                    self.maudeVersion = version.strip()
+        return self.maudeVersion
 
 
     def walker(self, arg, dirname, fnames):
@@ -174,15 +622,30 @@ class Main(object):
                 self.parseAndProve(filename)
 
 
-    def prove(self, MaudeModule):
+    def collector(self, inputfiles, dirname, fnames):
+        """ pathwalk directory recursively, only collect files """
+        completenames = [ dirname + os.sep + a for a in fnames ]
+        for filename in completenames:
+            if os.path.isfile(filename):
+                inputfiles.append(filename)
+
+
+    def prove(self, MaudeModule, output=None, timeout=None):
         """ try to locate a useful Maude install and start up
         a subprocess which takes our generated module as input,
-        and naturally tries to prove it"""
+        and naturally tries to prove it, returns a ProofResult"""
+
+        if not output:
+            output = self.textOutput()
+        if timeout is None:
+            timeout = self.defaults['timeout']
 
         whichMaude = Main.which(self.defaults['Maude'])
         if not whichMaude:
             sys.stderr.write("[ERROR] excutable Maude not found \n")
             sys.exit(1)
+        elif self.defaults['keep']:
+            text = self.poolProve(whichMaude, MaudeModule, output, timeout)
         else:
             (fd, fname) = tempfile.mkstemp(suffix=".maude",
                                            prefix="monologue-", 
@@ -200,12 +663,143 @@ class Main(object):
             child = SubProcess(whichMaude,
                                args,
                                self.defaults['escape'],
-                               self.defaults['timeout'],
-                               self.defaults['output'])
-            child.start()
+                               timeout,
+                               output)
+            text = child.start()
             #TODO subprocess(whichMaude, args, escape, timeout)
             os.unlink(fname)
 
+        return ProofResult.fromMaude(text)
+
+
+    def poolProve(self, whichMaude, TheoryModule, output, timeout):
+        """ let a long-lived Maude process prove the theory, the
+        static part of the template is already loaded by it"""
+
+        if not self.pool:
+            self.pool = MaudePool(whichMaude, 1, self.defaults['timeout'])
+
+        hashbar = None
+        if self.defaults['escape']:
+            hashbar = HashBar(timeout, None)
+            hashbar.start()
+
+        (result, fail) = self.pool.prove(TheoryModule, timeout)
+
+        if hashbar:
+            hashbar.stop()
+            hashbar.join()
+
+        if result : output.write(result)
+        if fail   : output.write(fail)
+
+        return result or fail
+
+
+    def pythonProve(self, theory, timeout):
+        """ prove theory without Maude (@see engine.prover) """
+
+        start = time.time()
+        prover = Prover(theory, timeout)
+        (status, rewrites, branches) = prover.prove()
+        real = int((time.time() - start) * 1000)
+
+        if status == 'timeout':
+            self.textOutput().write("[TIMEOUT]\n")
+        else:
+            self.textOutput().write("rewrites: %d in %dms real "
+                                    "(%d branches)\nresult: %s\n"
+                                    %(rewrites, real, branches, status))
+
+        rps = None
+        if real > 0:
+            rps = rewrites * 1000 / real
+
+        return ProofResult(status, rewrites=rewrites, real=real,
+                           rps=rps, engine='python')
+
+
+    def datalogProve(self, datalog):
+        """ prove a theory without disjunction or fresh
+        variables, i.e., no search (@see engine.datalog) """
+
+        start = time.time()
+        (status, rewrites) = datalog.prove(self.defaults['timeout'])
+        real = int((time.time() - start) * 1000)
+
+        self.textOutput().write("route       :  datalog\n")
+
+        if status == 'timeout':
+            self.textOutput().write("[TIMEOUT]\n")
+        else:
+            self.textOutput().write("rewrites: %d in %dms real\n"
+                                    "result: %s\n"%(rewrites, real, status))
+
+        rps = None
+        if real > 0 and rewrites is not None:
+            rps = rewrites * 1000 / real
+
+        return ProofResult(status, rewrites=rewrites, real=real,
+                           rps=rps, engine='datalog')
+
+
+    def satProve(self, sat):
+        """ ground the theory, and give it to a SAT solver, the
+        bound is the size of a countermodel (@see engine.sat) """
+
+        start = time.time()
+        (status, model) = sat.prove()
+        real = int((time.time() - start) * 1000)
+
+        self.textOutput().write("route       :  sat\n")
+
+        if status == 'timeout':
+            self.textOutput().write("[TIMEOUT]\n")
+        else:
+            self.textOutput().write("clauses: %d, conflicts: %d in %dms real\n"
+                                    "result: %s\n"%(sat.clauses, sat.conflicts,
+                                                    real, status))
+        if model is not None:
+            model = ModelFinder.show(model, sat.symbols)
+            self.writeModel(model, sat.optimized)
+
+        result = ProofResult(status, real=real, engine='sat')
+        result.model = model
+        if model is not None:
+            result.modelOf = Main.modelOf(sat.optimized)
+        return result
+
+
+    def countermodel(self, finder):
+        """ report the countermodel finder found (@see engine.finder) """
+
+        model = ModelFinder.show(finder.model, finder.symbols)
+
+        self.textOutput().write("route       :  countermodel\n"
+                                "result: countersatisfiable\n")
+        self.writeModel(model, finder.optimized)
+
+        result = ProofResult('countersatisfiable', rewrites=finder.rewrites,
+                             real=finder.real, engine='finder')
+        result.model = model
+        result.modelOf = Main.modelOf(finder.optimized)
+        return result
+
+
+    def writeModel(self, model, optimized):
+        self.textOutput().write("model: %s\n"%(model))
+        if optimized:
+            self.textOutput().write("model of    :  the sliced/simplified "
+                                    "theory, not the input\n")
+
+
+    @staticmethod
+    def modelOf(optimized):
+        """ which theory a model is a model of """
+        if optimized:
+            return 'optimized'
+        return 'input'
+
 
     def versionCheck(self, whichMaude):
         """ we need version 2.4 or better to do uncomment print statements """
@@ -229,18 +823,81 @@ class Main(object):
         return re.sub("-----", "", MaudeModule)
 
 
-    def getMaudeModule(self, inputfile):
-        """ parse inputfile and construct a Maude module """
-    
-        if not self.defaults['dump']:
-            if inputfile == '-':
-                self.defaults['output'].write("input file  :  stdin\n")
-            else:
-                bname = os.path.basename(inputfile)
-                self.defaults['output'].write("input file  :  %s\n"%(bname))
+    def getTheory(self, inputfile, quiet=0):
+        """ parse inputfile, errors are reported and we exit, unless
+        quiet is given, then they are raised as exceptions """
+
+        if Binary.isBinary(inputfile):
+            return self.loadTheory(inputfile, quiet)
 
+        if self.defaults['cache']:
+            return self.cachedTheory(inputfile, quiet)
+
+        return self.parseTheory(inputfile, quiet)
+
+
+    def parseTheory(self, inputfile, quiet=0):
+        """ parse inputfile, when quiet the parser collects errors
+        instead of reporting them (@see Parser.checkTheory) """
         parser = Parser()
+        if quiet:
+            parser.errors = []
         theory = parser.parseTheory(inputfile)
+        if parser.errors:
+            raise ParseError(parser.errors[0][3])
+        return theory
+
+
+    def loadTheory(self, inputfile, quiet=0):
+        """ load a compiled theory (monologue compile) """
+        try:
+            return Binary.load(inputfile)
+        except Exception, inst:
+            if quiet:
+                raise
+            sys.stderr.write(str(inst) + '\n')
+            sys.exit(1)
+
+
+    def cachedTheory(self, inputfile, quiet=0):
+        """ look for the parsed theory in the cache before we
+        lex and parse inputfile, stdin is never cached"""
+
+        if not self.theoryCache:
+            self.theoryCache = TheoryCache(self.defaults['cache'])
+
+        key = None
+        if inputfile != '-':
+            key = TheoryCache.fileKey(inputfile)
+
+        theory = None
+        if key:
+            theory = self.theoryCache.load(key)
+
+        if theory is None:
+            theory = self.parseTheory(inputfile, quiet).flatten()
+            if key:
+                self.theoryCache.store(key, theory)
+
+        return theory
+
+
+    def getMaudeModule(self, inputfile, quiet=0):
+        """ parse inputfile and construct a Maude module """
+        report = []
+        theory = self.optimize(self.getTheory(inputfile, quiet), report)
+        return self.fillTemplate(theory, report)
+
+
+    def fillTemplate(self, theory, report, timeout=None):
+        """ Maude module of an optimized theory, with -d the
+        report is written as comments at the top, saturation
+        is given up after timeout seconds if there is one """
+
+        # Maude only has to search, the Horn rules are done
+        saturator = Saturator(theory, timeout)
+        theory = saturator.saturate()
+        report.append("saturate: " + saturator.report())
 
         # filler == TemplateFiller
         filler = Filler(theory)
@@ -250,8 +907,32 @@ class Main(object):
         if not self.defaults['print']:
             setPrintOn = "--- no print attribute "
 
-        return filler.getMaudeModule(self.defaults['level'],
-                                     setPrintOn)
+        if self.defaults['keep'] and not self.defaults['dump']:
+            return filler.getTheoryModule(self.defaults['level'])
+
+        module = filler.getMaudeModule(self.defaults['level'], setPrintOn)
+
+        if self.defaults['dump']:
+            module = ''.join([ "--- %s\n"%(r) for r in report ]) + module
+
+        return module
+
+
+    def optimize(self, theory, report):
+        """ remove axioms which are only work for the prover, i.e.,
+        axioms the goal does not need (unless --all-axioms) and
+        redundant axioms, a line about each is added to report """
+
+        if self.defaults['slice']:
+            slicer = Slicer(theory)
+            theory = slicer.slice()
+            report.append("slice: " + slicer.report())
+
+        simplifier = Simplifier(theory)
+        theory = simplifier.simplify()
+        report.append("simplify: " + simplifier.report())
+
+        return theory
 
 
     def help(self):
@@ -293,5 +974,52 @@ class Main(object):
         return None
 
 
+#______________________________________________________________________________
+
+# each process in the --jobs pool holds a Main of its own, which
+# writes to a string buffer instead of defaults['output'], so that
+# the output can be written in order by the parent process
+
+job = None
+
+def initJob(defaults, stdin):
+    """ initialize a process in the --jobs pool """
+    global job
+    if stdin is not None:
+        sys.stdin = StringIO(stdin)
+    Main.defaults.update(defaults)
+    job = Main.__new__(Main) # argv is already parsed
+    job.pool = None
+    job.cache = None
+    job.theoryCache = None
+    job.maudeVersion = None
+    Finalize(job, closeJob, exitpriority=10)
+    signal.signal(signal.SIGTERM, stopJob)
+
+
+def closeJob():
+    """ stop long-lived Maude processes when pool process exits"""
+    if job.pool:
+        job.pool.close()
+
+
+def stopJob(signum, frame):
+    """ Pool.terminate sends SIGTERM, which skips Finalize """
+    closeJob()
+    os._exit(1)
+
+
+def proveJob(inputfile):
+    """ parse and prove inputfile, return (output, exit status)"""
+    output = StringIO()
+    Main.defaults['output'] = output
+    status = 0
+    try:
+        job.parseAndProve(inputfile)
+    except SystemExit, inst:
+        status = inst.code or 1
+    return (output.getvalue(), status)
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.optimize.saturate
+
+closes the facts of a Theory under its Horn rules, i.e., rules
+without disjunction and without fresh variables, like rule 3 and
+5-8 in problems/dpe.gl. this is what Maude would do first, one
+meta-level cycle of the single/double rules at a time, before it
+could start to split or make new constants:
+
+    true => p(a), r(a, b).
+    p(X), r(X, Y) => p(Y).
+    p(X) => q(X) ; s(X).
+
+    facts after saturation:  p(a), r(a, b), p(b)
+
+the new facts are given to the theory as a fact axiom of its own,
+so they end up in the initial term of the module, the Horn rules
+are kept, they are still needed after a split or an exists rule
+has added something. fact axioms with disjunction or variables
+are not facts to us, and are left for the prover.
+
+the facts are found by the Datalog engine (@see engine.datalog).
+with a timeout the saturation is given up when it runs out, and
+the theory is returned as it was, the prover has to find the facts
+itself then.
+
+example:
+
+    saturator = Saturator(theory, 3.0)
+    theory = saturator.saturate()
+    print saturator.report()
+
+"""
+
+import time     # timeout
+from no.uio.ifi.bjarneh.cl.parse.Parser import Theory, Axiom, \
+                                              SpecialFormula, Formula, \
+                                              Predicate, TermList, Term
+from no.uio.ifi.bjarneh.cl.engine.datalog import Datalog
+from no.uio.ifi.bjarneh.cl.engine.prover import Timeout, named
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='saturate.py 0.1'
+
+
+class Saturator(object):
+    """
+    Saturator
+    goal rules are left out, all facts are wanted, even
+    when the goal is found before we are done
+    """
+
+    def __init__(self, theory, timeout=None):
+        self.theory = theory.flatten()
+        self.timeout = timeout
+        self.timedout = 0
+        self.added = 0
+
+    def saturate(self):
+        """ return a new Theory with the closed fact set, or
+        the theory itself if we run out of time """
+
+        datalog = Datalog(self.theory, goals=0)
+        if self.timeout is not None:
+            datalog.deadline = time.time() + self.timeout
+        try:
+            derived = datalog.run()
+        except Timeout:
+            self.timedout = 1
+            return self.theory
+        self.added = len(derived)
+
+        if not derived:
+            return self.theory
+
+        saturated = Theory()
+        saturated.symbols = self.theory.getSymbols()
+        saturated.includes = self.theory.includes
+        saturated.extend(self.theory)
+        saturated.append(Axiom(SpecialFormula('true'),
+                               Saturator.formula(derived,
+                                                 datalog.symbols)))
+        return saturated
+
+    @staticmethod
+    def formula(atoms, symbols):
+        """ Formula:  p(a), r(a, b), ..  of the atoms, which
+        are ids of symbols (@see engine.prover.Rule) """
+        formula = Formula()
+        for atom in atoms:
+            ((name, arity), args) = named(atom, symbols)
+            if formula:
+                formula.append(',')
+            terms = TermList([ Term(t, 'WORD') for t in args ])
+            formula.append(Predicate(name, terms))
+        return formula
+
+    def report(self):
+        """ e.g.:  added 12 facts """
+        if self.timedout:
+            return "timeout, no facts added"
+        return "added %d facts"%(self.added)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.optimize.simplify
+
+removes axioms which can never make a difference to a proof,
+before the Theory is turned into a Maude module. every rule of
+the module is matched by generateSingles/generateDoubles in each
+cycle, so a rule we remove is work Maude never does. removed are:
+
+    duplicate  - the same axiom as an earlier one, when variables
+                 are renamed:  p(X) => q(X)  and  p(Y) => q(Y)
+    tautology  - one of the disjuncts in the conclusion is
+                 already in the premises (or among the facts):
+                 p(X), q(X) => q(X) ; r(X)
+    subsumed   - a more general axiom does the same job, i.e., it
+                 matches whenever this one matches and its
+                 conclusion is at least as strong:
+                 p(X) => q(X)  makes  p(X), r(X,Y) => q(X) ; s(Y)
+                 redundant, a goal axiom makes any axiom it
+                 matches redundant
+    fact       - a fact axiom (true => ...) whose facts are all
+                 given by earlier fact axioms
+
+the theory we are given is left as it is, axioms may be shared
+with other theories (libraries, @see Parser.library), the
+simplified theory keeps the SymbolTable of the original, so
+constants are numbered as before.
+
+example:
+
+    simplifier = Simplifier(theory)
+    theory = simplifier.simplify()
+    print simplifier.report()
+
+"""
+
+from no.uio.ifi.bjarneh.cl.parse.Parser import Theory
+from no.uio.ifi.bjarneh.cl.engine.prover import Rule, Branch, isVariable
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='simplify.py 0.1'
+
+
+class Simplifier(object):
+    """
+    Simplifier
+    axioms are compared as prover Rules (@see engine.prover), i.e.,
+    premises and disjuncts are lists of atoms, the first axiom of
+    a group of duplicates is the one we keep
+    """
+
+    reasons = ('duplicate', 'tautology', 'subsumed', 'fact')
+
+    def __init__(self, theory):
+        self.theory = theory.flatten()
+        self.removed = {}
+        for reason in Simplifier.reasons:
+            self.removed[reason] = 0
+
+    def simplify(self):
+        """ return a new Theory without the redundant axioms """
+
+        (rules, symbols) = Rule.compile(self.theory)
+
+        facts = set()
+        seen = set()
+        keep = []
+
+        for rule in rules:
+            if rule.premises:
+                reason = self.redundant(rule, seen, facts)
+            else:
+                reason = self.knownFacts(rule, facts)
+            if reason:
+                self.removed[reason] += 1
+            else:
+                keep.append(rule)
+
+        keep = self.subsumption(keep)
+
+        simple = Theory()
+        simple.symbols = self.theory.getSymbols()
+        simple.includes = self.theory.includes
+        for rule in keep:
+            simple.append(self.theory[rule.label - 1])
+        return simple
+
+    def total(self):
+        return sum(self.removed.values())
+
+    def report(self):
+        """ e.g.:  removed 3 of 40 axioms (2 duplicate, 1 subsumed) """
+        reasons = [ "%d %s"%(self.removed[r], r)
+                    for r in Simplifier.reasons if self.removed[r] ]
+        text = "removed %d of %d axioms"%(self.total(), len(self.theory))
+        if reasons:
+            text += " (%s)"%(', '.join(reasons))
+        return text
+
+    def redundant(self, rule, seen, facts):
+        """ reason why rule is redundant or None """
+
+        key = Simplifier.canonical(rule)
+        if key in seen:
+            return 'duplicate'
+        seen.add(key)
+
+        premises = set(rule.premises)
+        for disjunct in rule.disjuncts:
+            for atom in disjunct:
+                if atom not in premises and atom not in facts:
+                    break
+            else:
+                return 'tautology'
+
+        return None
+
+    def knownFacts(self, rule, facts):
+        """ 'fact' if rule only gives ground facts we have already,
+        the facts of rule are added to facts otherwise"""
+
+        if len(rule.disjuncts) != 1:
+            return None
+
+        atoms = rule.disjuncts[0]
+        for (key, args) in atoms:
+            for t in args:
+                if isVariable(t):
+                    return None
+
+        for atom in atoms:
+            if atom not in facts:
+                facts.update(atoms)
+                return None
+
+        return 'fact'
+
+    def subsumption(self, rules):
+        """ rules which are not subsumed by another rule we keep,
+        rules with fresh variables are left alone """
+
+        # a rule is found by its first premise, where variables are
+        # None, i.e., p(X, c0) is found as p(None, c0) (@see patterns)
+        index = {}
+        for rule in rules:
+            if rule.premises and not rule.fresh:
+                (key, args) = rule.premises[0]
+                pattern = tuple([ Simplifier.constant(t) for t in args ])
+                index.setdefault((key, pattern), []).append(rule)
+
+        removed = set()
+        keep = []
+
+        for rule in rules:
+            if rule.premises and not rule.fresh:
+                if self.subsumed(rule, index, removed):
+                    removed.add(rule.label)
+            if rule.label in removed:
+                self.removed['subsumed'] += 1
+            else:
+                keep.append(rule)
+
+        return keep
+
+    def subsumed(self, rule, index, removed):
+        """ true if some rule in index, which is not removed, subsumes rule """
+        keys = set([ key for (key, args) in rule.premises ])
+        tried = set([rule.label])
+        for atom in rule.premises:
+            for pattern in Simplifier.patterns(atom):
+                for general in index.get(pattern, ()):
+                    if general.label in tried or general.label in removed:
+                        continue
+                    tried.add(general.label)
+                    # a split rule is not applied as eagerly
+                    if rule.kind == 'horn' and general.kind == 'split':
+                        continue
+                    if Simplifier.subsumes(general, rule, keys):
+                        return 1
+        return 0
+
+    @staticmethod
+    def constant(t):
+        if isVariable(t):
+            return None
+        return t
+
+    @staticmethod
+    def patterns(atom):
+        """ every way to write a premise that matches atom, with
+        some (or all) of its constants replaced by None """
+        (key, args) = atom
+        positions = [ i for i in range(len(args)) if not isVariable(args[i]) ]
+        for n in range(0, 1 << len(positions)):
+            terms = [None] * len(args)
+            for j in range(len(positions)):
+                if n & (1 << j):
+                    terms[positions[j]] = args[positions[j]]
+            yield (key, tuple(terms))
+
+    @staticmethod
+    def subsumes(general, rule, keys):
+        """ true if general makes rule redundant: some substitution
+        takes the premises of general into the premises of rule,
+        and every disjunct of general contains a disjunct of rule,
+        variables of rule are treated as constants """
+
+        if len(general.premises) > len(rule.premises):
+            return 0
+        for (key, args) in general.premises:
+            if key not in keys:
+                return 0
+
+        branch = Branch()
+        branch.add(rule.premises)
+
+        disjuncts = [ set(d) for d in rule.disjuncts ]
+
+        for s in branch.matches(general.premises, {}):
+            strong = 1
+            for disjunct in general.disjuncts:
+                instance = set(branch.instantiate(disjunct, s))
+                for d in disjuncts:
+                    if d <= instance:
+                        break
+                else:
+                    strong = 0
+                    break
+            if strong:
+                return 1
+
+        return 0
+
+    @staticmethod
+    def canonical(rule):
+        """ rule with variables renamed in the order we find them,
+        V0, V1 .. so they are still variables (str) """
+        names = {}
+        def rename(atoms):
+            renamed = []
+            for (key, args) in atoms:
+                terms = []
+                for t in args:
+                    if isVariable(t):
+                        if not names.has_key(t):
+                            names[t] = 'V%d'%(len(names))
+                        terms.append(names[t])
+                    else:
+                        terms.append(t)
+                renamed.append((key, tuple(terms)))
+            return tuple(renamed)
+        return (rename(rule.premises),
+                tuple([ rename(d) for d in rule.disjuncts ]),
+                rule.kind)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.optimize.slicing
+
+removes the part of a Theory which the goal does not depend on.
+a predicate is relevant if it is in the premises of a goal (or
+false) axiom, or in the premises of an axiom which has a relevant
+predicate in its conclusion. an axiom without relevant predicates
+in its conclusion can never help us close a branch, everything
+it adds is ignored by the axioms we keep, so it is removed, and
+so are facts of predicates which are never read:
+
+    true => p(a), z(a).
+    p(X) => q(X) ; r(X).
+    r(X) => z(X).           <- removed, z is never read
+    q(X) => goal.
+    r(X) => goal.
+
+    the fact axiom becomes:  true => p(a).
+
+theories without goal axioms are left as they are, just like
+the Simplifier (@see optimize.simplify) the sliced theory keeps
+the SymbolTable of the original.
+
+example:
+
+    slicer = Slicer(theory)
+    theory = slicer.slice()
+    print slicer.report()
+
+"""
+
+from no.uio.ifi.bjarneh.cl.parse.Parser import Theory, Axiom, Formula
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='slicing.py 0.1'
+
+
+def predicates(formula):
+    """ the Predicates of a Formula, i.e., without , and ; """
+    return [ p for p in formula if p != ',' and p != ';' ]
+
+
+def key(predicate):
+    return (predicate.name, len(predicate.termlist))
+
+
+class Slicer(object):
+    """
+    Slicer
+    the dependency graph is kept as a dictionary from the key of
+    a predicate, (name, arity), to the axioms which conclude it
+    """
+
+    def __init__(self, theory):
+        self.theory = theory.flatten()
+        self.removed = 0    # axioms
+        self.facts = 0      # facts of fact axioms we keep
+
+    def relevant(self):
+        """ keys of the predicates the goal axioms depend on """
+
+        producers = {}
+        relevant = set()
+
+        for axiom in self.theory:
+            if axiom.goalAxiom():
+                if not axiom.factAxiom():
+                    relevant.update([ key(p) for p in predicates(axiom.left) ])
+            else:
+                for p in axiom.getRight():
+                    producers.setdefault(key(p), []).append(axiom)
+
+        todo = list(relevant)
+
+        while todo:
+            for axiom in producers.pop(todo.pop(), ()):
+                if axiom.factAxiom():
+                    continue
+                for p in predicates(axiom.left):
+                    k = key(p)
+                    if k not in relevant:
+                        relevant.add(k)
+                        todo.append(k)
+
+        return relevant
+
+    def slice(self):
+        """ return a new Theory with axioms the goal depends on """
+
+        goals = [ ax for ax in self.theory if ax.goalAxiom() ]
+        if not goals:
+            return self.theory
+
+        relevant = self.relevant()
+
+        sliced = Theory()
+        sliced.symbols = self.theory.getSymbols()
+        sliced.includes = self.theory.includes
+
+        for axiom in self.theory:
+            if not axiom.goalAxiom():
+                right = axiom.getRight()
+                facts = [ p for p in right if key(p) in relevant ]
+                if not facts:
+                    self.removed += 1
+                    continue
+                if len(facts) < len(right) and axiom.factAxiom() \
+                   and ';' not in axiom.right:
+                    self.facts += len(right) - len(facts)
+                    axiom = Axiom(axiom.left, Slicer.conjunction(facts))
+            sliced.append(axiom)
+
+        return sliced
+
+    @staticmethod
+    def conjunction(facts):
+        """ Formula:  p(a), q(b), ..  """
+        formula = Formula()
+        for p in facts:
+            if formula:
+                formula.append(',')
+            formula.append(p)
+        return formula
+
+    def report(self):
+        """ e.g.:  removed 3 of 40 axioms (2 facts) """
+        text = "removed %d of %d axioms"%(self.removed, len(self.theory))
+        if self.facts:
+            text += " (%d facts)"%(self.facts)
+        return text
+
+
+if __name__ == '__main__':
+    pass
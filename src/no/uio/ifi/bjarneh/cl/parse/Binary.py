@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.parse.Binary
+
+compiled theories (.glb files), i.e., a flattened Theory (no
+function terms) with its SymbolTable, i.e., constants numbered
+and the predicate signatures, so nothing needs to be lexed,
+parsed or flattened when it is loaded.
+
+compiled theories are shipped to other machines, so the format
+is data only, nothing in a .glb file is ever run. every name is
+written once, in a table of strings, and every term node once,
+the axioms are a flat array of ints which refer to them, so
+loading is reading a few arrays and building each node once:
+
+    GLB <version>\\n
+    counts      10 int32:  predicates, constants, variables,
+                functions, includes, terms, axioms, bytes of
+                names, ints of the body, bytes per int
+    mtimes      float64 per include
+    names       NUL separated:  predicates, constants, variables,
+                functions, include paths
+    body        int16 (or int32 if one is too big for it):
+                arity per predicate, arity per function,
+                size per include, the terms, the axioms
+
+all numbers are little-endian, and each section starts at a
+multiple of 8 bytes, so the file can be mapped and read in place.
+a term is its kind (WORD, VARIABLE, FUNCTION), the id of its
+symbol and for a function the number of each argument, terms
+are numbered from 1 in the order they are written, arguments
+first. a formula is the number of items, or one of the negative
+codes of true, goal and false (SpecialFormula), an item is ','
+(0), ';' (-1), or the id of a predicate followed by the number
+of each of its terms. fresh variables are not written, they are
+found for each axiom as the module is filled (@see
+Axiom.freshVariables).
+
+example:
+
+    theory = Parser().parseTheory('problems/ap.gl').flatten()
+    open('ap.glb', 'wb').write(dumps(theory))
+
+    theory = load('ap.glb')
+
+"""
+
+import sys      # byte order
+import struct   # counts and mtimes
+from array import array
+from no.uio.ifi.bjarneh.cl.parse.Parser import Theory, Axiom, Formula, \
+                                              SpecialFormula, Predicate, \
+                                              TermList, SymbolTable
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='Binary.py 0.1'
+
+
+suffix  = '.glb'
+magic   = 'GLB'
+version = 5  # change when the format changes
+
+counts  = struct.Struct('<10i')
+kinds   = ('WORD', 'VARIABLE', 'FUNCTION')
+special = { 'true' : -1, 'goal' : -2, 'false' : -3 }
+COMMA   = 0
+BAR     = -1
+
+
+def isBinary(filename):
+    """ compiled theories are recognized by their suffix """
+    return filename.endswith(suffix)
+
+
+def dumps(theory):
+    """ theory should be flattened (@see Theory.flatten) """
+
+    symbols = theory.getSymbols()
+    numbers = {}    # (kind, symbol, numbers of args) -> number of term
+    terms = []
+    axioms = []
+
+    def term(t):
+        args = tuple([ term(a) for a in t.args ])
+        kind = kinds.index(t.ttype)
+        if kind == 0:
+            symbol = symbols.constants[t.tvalue]
+        elif kind == 1:
+            symbol = symbols.variables[t.tvalue]
+        else:
+            symbol = symbols.functions[(t.tvalue, len(args))]
+        key = (kind, symbol, args)
+        number = numbers.get(key)
+        if number is None:
+            terms.extend(key[:2])
+            terms.extend(args)
+            number = len(numbers) + 1
+            numbers[key] = number
+        return number
+
+    def formula(f):
+        if type(f) is SpecialFormula:
+            axioms.append(special[f.constant])
+            return
+        axioms.append(len(f))
+        for p in f:
+            if p == ',':
+                axioms.append(COMMA)
+            elif p == ';':
+                axioms.append(BAR)
+            else:
+                axioms.append(symbols.predicates[(p.name, len(p))])
+                axioms.extend([ term(t) for t in p.termlist ])
+
+    for ax in theory:
+        formula(ax.left)
+        formula(ax.right)
+
+    predicates = symbols.predicates.names
+    functions = symbols.functions.names
+    includes = theory.includes
+
+    names = '\0'.join([ name for (name, arity) in predicates ] +
+                      symbols.constants.names +
+                      symbols.variables.names +
+                      [ name for (name, arity) in functions ] +
+                      [ path for (path, size, mtime) in includes ])
+
+    body = ([ arity for (name, arity) in predicates ] +
+            [ arity for (name, arity) in functions ] +
+            [ size for (path, size, mtime) in includes ] +
+            terms + axioms)
+    if body and (max(body) > 32767 or min(body) < -32768):
+        body = array('i', body)
+    else:
+        body = array('h', body)
+    mtimes = array('d', [ mtime for (path, size, mtime) in includes ])
+    if sys.byteorder != 'little':
+        body.byteswap()
+        mtimes.byteswap()
+
+    data = [ "%s %d\n"%(magic, version) ]
+    data.append(counts.pack(len(predicates), len(symbols.constants.names),
+                            len(symbols.variables.names), len(functions),
+                            len(includes), len(numbers), len(theory),
+                            len(names), len(body), body.itemsize))
+    for section in (mtimes.tostring(), names, body.tostring()):
+        data.append(padding(data))
+        data.append(section)
+    return ''.join(data)
+
+
+def padding(data):
+    """ NUL's up to the next multiple of 8 bytes """
+    return '\0' * (-sum(map(len, data)) % 8)
+
+
+def loads(data):
+    """ return Theory, raise Exception if data is not a
+    compiled theory of this version"""
+    end = data.find('\n', 0, 32)
+    header = data[:end].split()
+    if end < 0 or len(header) != 2 or header[0] != magic:
+        raise Exception("[ERROR] not a compiled theory (%s)"%(suffix))
+    if header[1] != str(version):
+        raise Exception("[ERROR] theory compiled by another version, "
+                        "format: %s, expected: %d (recompile it)"
+                        %(header[1], version))
+    try:
+        return loadTheory(data, end + 1)
+    except (ValueError, TypeError, KeyError, IndexError, struct.error):
+        raise Exception("[ERROR] broken compiled theory (%s)"%(suffix))
+
+
+def loadTheory(data, offset):
+    """ Theory of data after the header line, the symbols are
+    added in the order they were written, so they get the same
+    ids, and the terms are hash-consed again (@see SymbolTable) """
+
+    (npredicates, nconstants, nvariables, nfunctions, nincludes,
+     nterms, naxioms, nnames, nbody, width) = counts.unpack_from(data, offset)
+    offset += counts.size
+
+    if width not in (2, 4):
+        raise ValueError(width)
+    body = array(('h', 'i')[width == 4])
+    (mtimes, offset) = section(data, offset, array('d'), nincludes * 8)
+    (names, offset) = section(data, offset, None, nnames)
+    (body, offset) = section(data, offset, body, nbody * width)
+    if offset != len(data):
+        raise ValueError(offset)
+
+    # a term or an axiom takes at least two ints
+    if min(npredicates, nconstants, nvariables, nfunctions, nincludes,
+           nterms, naxioms) < 0 or 2 * (nterms + naxioms) > nbody:
+        raise ValueError(nbody)
+
+    names = [ intern(name) for name in names.split('\0') if names ]
+    if len(names) != (npredicates + nconstants + nvariables +
+                      nfunctions + nincludes):
+        raise ValueError(len(names))
+
+    symbols = SymbolTable()
+    n = 0
+    i = 0
+    for j in range(npredicates):
+        symbols.predicates.add((names[n], body[i]))
+        (n, i) = (n + 1, i + 1)
+    for j in range(nconstants):
+        symbols.constants.add(names[n])
+        n += 1
+    for j in range(nvariables):
+        symbols.variables.add(names[n])
+        n += 1
+    for j in range(nfunctions):
+        symbols.functions.add((names[n], body[i]))
+        (n, i) = (n + 1, i + 1)
+
+    theory = Theory()
+    theory.symbols = symbols
+    for j in range(nincludes):
+        theory.includes.append((names[n], body[i], mtimes[j]))
+        (n, i) = (n + 1, i + 1)
+
+    # symbols of each kind, by id
+    tables = (symbols.constants.names, symbols.variables.names,
+              [ name for (name, arity) in symbols.functions.names ])
+    arities = [ arity for (name, arity) in symbols.functions.names ]
+
+    terms = [ None ]
+    for j in range(nterms):
+        (kind, symbol) = (body[i], body[i + 1])
+        i += 2
+        if kind not in (0, 1, 2) or symbol < 1:
+            raise ValueError(kind)
+        args = ()
+        if kind == 2:
+            arity = arities[symbol - 1]
+            args = [ terms[number(k)] for k in body[i:i + arity] ]
+            i += arity
+        terms.append(symbols.term(tables[kind][symbol - 1],
+                                  kinds[kind], args))
+
+    predicates = [ None ] + symbols.predicates.names
+    atoms = {}      # equal atoms are the same Predicate
+
+    def atom(key):
+        (name, arity) = predicates[key[0]]
+        args = TermList([ terms[number(k)] for k in key[1:] ])
+        atoms[key] = Predicate(name, args)
+        return atoms[key]
+
+    def formula(i):
+        n = body[i]
+        i += 1
+        if n < 0:
+            return (SpecialFormula(('true', 'goal', 'false')[-n - 1]), i)
+        if n > len(body) - i:
+            raise ValueError(n)
+        items = Formula()
+        for j in range(n):
+            p = body[i]
+            if p > 0:
+                end = i + 1 + predicates[p][1]
+                key = tuple(body[i:end])
+                items.append(atoms.get(key) or atom(key))
+                i = end
+            elif p == COMMA:
+                items.append(',')
+                i += 1
+            elif p == BAR:
+                items.append(';')
+                i += 1
+            else:
+                raise ValueError(p)
+        return (items, i)
+
+    for j in range(naxioms):
+        (left, i) = formula(i)
+        (right, i) = formula(i)
+        theory.append(Axiom(left, right))
+
+    if i != len(body):
+        raise ValueError(i)
+    return theory
+
+
+def number(n):
+    """ ids and numbers start at 1, a list is never indexed from
+    the end by a broken file """
+    if n < 1:
+        raise ValueError(n)
+    return n
+
+
+def section(data, offset, items, size):
+    """ (items, offset after them) of the section at the next
+    multiple of 8 bytes, a str if items is None """
+    offset += -offset % 8
+    end = offset + size
+    if size < 0 or end > len(data):
+        raise ValueError(end)
+    if items is None:
+        return (data[offset:end], end)
+    items.fromstring(data[offset:end])
+    if sys.byteorder != 'little':
+        items.byteswap()
+    return (items.tolist(), end)
+
+
+def load(filename):
+    fh = open(filename, 'rb')
+    data = fh.read()
+    fh.close()
+    return loads(data)
+
+
+if __name__ == '__main__':
+    pass
@@ -12,36 +12,63 @@ import sys, re
 __author__='bjarneh@ifi.uio.no'
 __version__='Lexer.py 0.1'
 
+# a token is a tuple:  (kind, value, offset)
+# where offset is the position of the token in the input
+
+KIND   = 0
+VALUE  = 1
+OFFSET = 2
+
+# kinds of tokens are integers, the number of the group in
+# prologGrammar which matched (lastindex), so they must be
+# listed in the same order as the groups, names are for errors
+
+(WORD, VARIABLE, COMMA, SEMICOLON, IMPLIES, ENDPROLOG,
+ STARTPARENTHESIS, ENDPARENTHESIS, DIRECTIVE, STRING,
+ COMMENT, SPACE, MISMATCH) = range(1, 14)
+
+kindNames = (None, 'WORD', 'VARIABLE', 'COMMA', 'SEMICOLON', 'IMPLIES',
+             'ENDPROLOG', 'STARTPARENTHESIS', 'ENDPARENTHESIS',
+             'DIRECTIVE', 'STRING', 'COMMENT', 'SPACE', 'MISMATCH')
+
+
 class Lexer(object):
     """
     Lexer
-    using the regular expressions given to the re.Scanner class
-    pieces of string is returned and given to callbacks (functions).
-    for each callback (unless it is set to None) we initializes a 
-    Token object, which is then returned to the scanner, who assembles
-    these into a list. That list is then put into a class called Tokenizer 
-    which hands them out one Token at a time.
+    one compiled regular expression with a named group for
+    each kind of token, finditer walks through the input and
+    the number of the group that matched (lastindex) is the kind
+    of token. comments and whitespace are dropped, and the
+    tokens are put into a class called Tokenizer which hands
+    them out one token at a time. the closing quote of a STRING
+    is optional, so that a string which is cut in two by the
+    end of a chunk is held back (@see TokenStream) instead of
+    being a mismatch, the parser checks that it is closed.
+    characters which match nothing become MISMATCH tokens,
+    which the parser reports as errors where they are found.
     """
 
-    def __init__(self):
-        self.scanner = re.Scanner(self.prologGrammar())
+    prologGrammar = re.compile(r"""
+          (?P<WORD>[a-z][a-zA-Z0-9_]*)
+        | (?P<VARIABLE>[A-Z_][a-zA-Z0-9_]*)
+        | (?P<COMMA>,)
+        | (?P<SEMICOLON>;)
+        | (?P<IMPLIES>=>)
+        | (?P<ENDPROLOG>\.)
+        | (?P<STARTPARENTHESIS>\()
+        | (?P<ENDPARENTHESIS>\))
+        | (?P<DIRECTIVE>:-)
+        | (?P<STRING>'[^'\n]*'?)
+        | (?P<COMMENT>%[^\n]*)
+        | (?P<SPACE>\s+)
+        | (?P<MISMATCH>.)
+    """, re.VERBOSE)
+
+    ignore = (COMMENT, SPACE)
+
+    chunksize = 64 * 1024
 
-    def __iter__(self):
-        return self.scanner.__iter__()
-
-    def prologGrammar(self):
-        grammar = []
-        grammar.append( (r"[a-z][a-zA-Z0-9_]*", self.word) )
-        grammar.append( (r"[A-Z_][a-zA-Z0-9_]*", self.variableident) )
-        grammar.append( (r",|;|=>", self.logisep) ) 
-        grammar.append( (r"\.", self.endprolog) )
-        grammar.append( (r"\(", self.startprnt) )
-        grammar.append( (r"\)", self.endprnt) )
-        grammar.append( (r"%.*\n", None) ) # ignore comments
-        grammar.append( (r"\s*", None) ) # ignore whitespace
-        return grammar
 
-    
     def fileScan(self, fname):
 
         if(fname == '-'):
@@ -49,36 +76,37 @@ class Lexer(object):
         else:
             fh = open(fname, 'r')
             lines = fh.read()
-            fh.close
+            fh.close()
 
         return self.scan(lines)
 
 
     def scan(self, input):
-        tokens, remainder = self.scanner.scan(input)
-        if(remainder):
-            sys.stderr.write("[ warning ] entire file did not match grammar \n")
-        return Tokenizer(tokens)
-
-    ## the actual tokens returned
+        return Tokenizer(self.tokens(input), input)
 
-    def variableident(self, scanner, token):
-        return Token('VARIABLE', token)
 
-    def logisep(self, scanner, token):
-        return Token('LOGICSEPARATOR', token)
+    def streamScan(self, fname):
+        """ like fileScan, but the input is lexed a chunk at a
+        time, while the parser asks for tokens (@see TokenStream)"""
 
-    def word(self, scanner, token):
-        return Token('WORD', token)
+        if(fname == '-'):
+            fh = sys.stdin
+        else:
+            fh = open(fname, 'r')
 
-    def startprnt(self, scanner, token):
-        return Token('STARTPARENTHESIS', token)
+        return StreamTokenizer(TokenStream(fh, self.chunksize))
 
-    def endprnt(self, scanner, token):
-        return Token('ENDPARENTHESIS', token)
 
-    def endprolog(self, scanner, token):
-        return Token('ENDPROLOG', token)
+    def tokens(self, input):
+        """ list of (kind, value, offset) tuples """
+        tokens = []
+        ignore = Lexer.ignore
+        for m in Lexer.prologGrammar.finditer(input):
+            kind = m.lastindex
+            if kind in ignore:
+                continue
+            tokens.append((kind, m.group(), m.start()))
+        return tokens
 
 
 #______________________________________________________________________________
@@ -86,78 +114,194 @@ class Lexer(object):
 class Tokenizer(object):
     """
     Tokenizer
-    returns tokens one at a time, and will also stuff
-    used tokens into self.buffer. this can be useful
-    when something goes wrong during parsing to inform
-    user of where in the text he has syntax errors.
+    returns tokens one at a time, by moving a cursor (pos)
+    over the list of tokens, the tokens are never removed.
+    this can be useful when something goes wrong during
+    parsing to inform user of where in the text he has syntax
+    errors, the tokens before the cursor and their offsets
+    into the input tell us where we are.
     """
-    def __init__(self, tokens):
+    def __init__(self, tokens, input=None):
         self.tokens = tokens
-        self.buffer = []
+        self.input = input
+        self.pos = 0
 
     def current(self):
-        if(self.tokens): return self.tokens[0]
+        if(self.pos < len(self.tokens)): return self.tokens[self.pos]
         return None
 
     def readnext(self):
-        self.buffer.append(self.tokens[0].tvalue)
-        del self.tokens[0]
+        self.pos += 1
 
     def hasmore(self):
-        return self.tokens
+        return self.pos < len(self.tokens)
 
     def unshift(self, token):
-        self.tokens.insert(0, token)
+        if(self.pos > 0 and self.tokens[self.pos - 1] is token):
+            self.pos -= 1
+        else:
+            self.tokens.insert(self.pos, token)
+
+    def lineColumn(self):
+        """ line and column (from 1) of the current token """
+        if(self.input is None): return None
+        if(self.hasmore()):
+            offset = self.tokens[self.pos][OFFSET]
+        else:
+            offset = len(self.input)
+        line = self.input.count('\n', 0, offset) + 1
+        column = offset - (self.input.rfind('\n', 0, offset) + 1) + 1
+        return (line, column)
 
     def where(self):
         """ report where in file error occured"""
         
-        if(not self.buffer): return "\n"
+        if(not self.consumed()): return "\n"
 
-        for i in range(0, len(self.buffer)):
-            if(self.buffer[i] == '.'):
-                self.buffer[i] = '.\n'
+        consumed = []
+        for token in self.consumed():
+            if(token[VALUE] == '.'):
+                consumed.append('.\n')
+            else:
+                consumed.append(token[VALUE])
 
-        errbuffer = ''.join(self.buffer)
+        errbuffer = ''.join(consumed)
 
         i = len(errbuffer) -1
         while(errbuffer[i] != '\n' and i > 0):
             i = i -1
         placement = '\n'+ ' '* (len(errbuffer) - i -1) + '^^^'
+
+        position = self.lineColumn()
+        if(position):
+            placement += '\n(line %d, column %d)'%(position)
         
         return "\n\n"+errbuffer+placement+'\n\n'
 
     def __str__(self):
-        return self.tokens.__str__()
+        return self.tokens[self.pos:].__str__()
+
+    def consumed(self):
+        return self.tokens[:self.pos]
 
 #______________________________________________________________________________
 
-class Token(object):
+class TokenStream(object):
     """
-    Token
-    represents a single token, contains
-    value and type, '==' is overloaded to
-    compare with value.
+    TokenStream
+    reads input a chunk at a time and hands out tokens as
+    they are lexed. a token which touches the end of what
+    we have read so far may continue in the next chunk, so
+    it is kept in the buffer until more input arrives. the
+    line and column of the start of the buffer is counted
+    as the buffer is emptied, so that errors can be reported
+    without keeping the input around.
     """
-    
-    def __init__(self, t_type, t_value):
-        self.ttype = t_type
-        self.tvalue = t_value
+    def __init__(self, fh, chunksize):
+        self.fh = fh
+        self.chunksize = chunksize
+        self.buffer = ''
+        self.base = 0       # offset of buffer in input
+        self.line = 1       # line of buffer start
+        self.column = 1     # column of buffer start
+
+    def __iter__(self):
+        grammar = Lexer.prologGrammar
+        ignore = Lexer.ignore
+        eof = 0
+        while(not eof):
+            chunk = self.fh.read(self.chunksize)
+            if(not chunk):
+                eof = 1
+                if(self.fh is not sys.stdin): self.fh.close()
+            self.buffer += chunk
+            # a token ending here may continue in the next chunk,
+            # at the end of input no token can end beyond it
+            held = len(self.buffer) + eof
+            base = self.base
+            done = 0
+            for m in grammar.finditer(self.buffer):
+                end = m.end()
+                if(end == held):
+                    break
+                done = end
+                kind = m.lastindex
+                if kind in ignore:
+                    continue
+                yield (kind, m.group(), base + m.start())
+            self.advance(done)
+
+    def advance(self, n):
+        """ drop n characters from the start of the buffer"""
+        dropped = self.buffer[:n]
+        newlines = dropped.count('\n')
+        if(newlines):
+            self.line += newlines
+            self.column = n - dropped.rfind('\n')
+        else:
+            self.column += n
+        self.buffer = self.buffer[n:]
+        self.base += n
+
+    def lineColumn(self, offset):
+        """ line and column of offset, which must be inside buffer"""
+        if(offset is None): offset = self.base + len(self.buffer)
+        i = offset - self.base
+        newlines = self.buffer.count('\n', 0, i)
+        if(newlines):
+            return (self.line + newlines, i - self.buffer.rfind('\n', 0, i))
+        return (self.line, self.column + i)
+
+#______________________________________________________________________________
+
+class StreamTokenizer(Tokenizer):
+    """
+    StreamTokenizer
+    same as Tokenizer, but the tokens come from a TokenStream
+    and only the tokens consumed since the last call to forget
+    are kept (the parser forgets after each axiom)
+    """
+    def __init__(self, stream):
+        Tokenizer.__init__(self, [], None)
+        self.stream = stream
+        self.source = iter(stream)
+        self.buffer = []
+        self.pending = []
+        self.token = None
+        self.readnext()
+        self.buffer = []
+
+    def current(self):
+        return self.token
+
+    def readnext(self):
+        if(self.token): self.buffer.append(self.token)
+        if(self.pending):
+            self.token = self.pending.pop()
+        else:
+            self.token = next(self.source, None)
+
+    def hasmore(self):
+        return self.token is not None
+
+    def unshift(self, token):
+        if(self.token): self.pending.append(self.token)
+        if(self.buffer and self.buffer[-1] is token):
+            self.buffer.pop()
+        self.token = token
+
+    def forget(self):
+        self.buffer = []
 
-    def __eq__(self, other):
-        """ equality testing is based on token, not type"""
-        return str(self.tvalue) == str(other)
+    def consumed(self):
+        return self.buffer
 
-    def __ne__(self, other):
-        """ equality testing is based on token, not type"""
-        return not self.__eq__(other)
+    def lineColumn(self):
+        if(self.token): return self.stream.lineColumn(self.token[OFFSET])
+        return self.stream.lineColumn(None)
 
     def __str__(self):
-        s_token = []
-        s_token.append('Token(')
-        s_token.append(str(self.ttype)+", ")
-        s_token.append("'" + str(self.tvalue) + "')")
-        return ''.join(s_token)
+        return str(self.token)
 
 #______________________________________________________________________________
 
@@ -193,5 +337,6 @@ if __name__ == '__main__':
         tokenizer = lexer.fileScan(sys.argv[1])
 
     while(tokenizer.hasmore()):
-        print tokenizer.current()
+        token = tokenizer.current()
+        print kindNames[token[KIND]], token[VALUE], token[OFFSET]
         tokenizer.readnext()
@@ -5,22 +5,48 @@ no.uio.ifi.bjarneh.cl.parse.Parser
 
 A simple Prolog parser for the geometric logic
 grammer used by geolog.
+
+a theory may include the axioms of a library file with a
+Prolog directive, relative paths are relative to the file
+which holds the directive:
+
+    :- include('lib/equality.gl').
+
+each library is parsed once per process, and its Axioms are
+shared by all theories which include it (@see Parser.library)
+
+checkTheory parses a file without stopping at the first error,
+after an error the parser skips to the next '.' and goes on,
+so all errors of the file are found:
+
+    for (fname, line, column, msg) in Parser().checkTheory(fname):
+        print "%s:%d:%d: %s"%(fname, line, column, msg)
 """
 
 import sys
-from inspect import currentframe
-from Lexer import Lexer
+import os
+from Lexer import Lexer, KIND, VALUE
+from Lexer import WORD, VARIABLE, COMMA, SEMICOLON, IMPLIES, ENDPROLOG
+from Lexer import STARTPARENTHESIS, ENDPARENTHESIS, DIRECTIVE, STRING
 
 
 __author__='bjarneh@ifi.uio.no'
 __version__='Parser.py 0.1'
 
 
-def lineNo(curframe):
-    """ utility function to help me find out
-    where things are failing, without cluttering
-    up large parts of the code"""
-    return "\n[ Parser.py  line: "+str(curframe.f_lineno)+" ]"
+def metaInt(n):
+    """ the meta representation of an integer, i.e., what
+    upTerm would give us inside Maude:
+
+    0 -> '0.Zero,  2 -> 's_^2['0.Zero],  -1 -> '-_['s_['0.Zero]]
+    """
+    if n < 0:
+        return "'-_[%s]"%(metaInt(-n))
+    if n == 0:
+        return "'0.Zero"
+    if n == 1:
+        return "'s_['0.Zero]"
+    return "'s_^%d['0.Zero]"%(n)
 
 
 class Parser(object):
@@ -32,8 +58,15 @@ class Parser(object):
     will be used to build another theorem-prover.
     """
 
+    libraries = {}  # absolute path -> (stamp, axioms, includes)
+    including = []  # libraries being parsed, to catch include cycles
+
     def __init__(self, filename=None):
         self.tokenizer = None
+        self.filename = filename
+        self.symbols = SymbolTable()
+        self.includes = []
+        self.errors = None  # list of errors when we check (@see checkTheory)
         if(filename): 
             self.tokenizer = self.getTokens(filename)
 
@@ -47,81 +80,231 @@ class Parser(object):
             sys.exit(1)
         return tokenizer
 
+    def getTokenStream(self, filename):
+        """ return tokenizer which lexes file while we parse """
+        lexer = Lexer()
+        try:
+            tokenizer = lexer.streamScan(filename)
+        except Exception, inst:
+            if(self.errors is not None):
+                self.errors.append((filename, 0, 0, str(inst)))
+                raise ParseError(str(inst))
+            sys.stderr.write(str(inst)+'\n')
+            sys.exit(1)
+        return tokenizer
+
     def perror(self, msg):
         """
         print an error message and quit, this will
         be called when we get an unexpected end of tokens,
         or a sequence of characters which does not match our
-        grammar/syntax.
+        grammar/syntax, where() tells the user where (offset
+        of the current token turned into line and column).
+        when we check, the error is stored and ParseError raised
         """
-        sys.stderr.write(str(msg)+'\n')
+        if(self.errors is not None):
+            (line, column) = self.tokenizer.lineColumn() or (0, 0)
+            self.errors.append((self.filename or '-', line, column, str(msg)))
+            raise ParseError(msg)
+        sys.stderr.write("[ERROR] "+str(msg)+'\n')
         sys.stderr.write(self.tokenizer.where())
         sys.exit(1)
-    
-    def skipExpectedToken(self, token=None, ttype=None, msg=""):
-        """ see if next token is as expected, if not write error message
-        and quit, for now this is very basic and the user gets very
-        bad info on what exactly went wrong and where..."""
-        
-        if(not (token or ttype) ): 
-            raise Exception("Parser.skipExpectedToken: token or ttype required")
-
-        curToken = self.tokenizer.current()
 
-        if(ttype):
-            if(not curToken):
-                self.perror(msg+" unexpected end of tokens")
-            elif(curToken.ttype != ttype):
-                self.perror(msg+" expected type: "+ttype+", got: "+curToken.ttype)
+    def recover(self):
+        """ skip the rest of an axiom after an error, i.e.,
+        up to and including the next '.' """
+        tok = self.tokenizer
+        last = tok.consumed()[-1:]
+        if(last and last[0][KIND] == ENDPROLOG):
+            return # error came after the axiom was done
+        while(tok.current() and tok.current()[KIND] != ENDPROLOG):
+            tok.readnext()
+        tok.readnext()
+
+    def unexpected(self, expected):
+        """ report that current token is not what we expected """
+        token = self.tokenizer.current()
+        if(token is None):
+            self.perror("unexpected end of tokens, expected "+expected)
+        self.perror("expected "+expected+" got '"+token[VALUE]+"'")
+
+    def expect(self, kind):
+        """ skip current token if it is of this kind, if
+        not we report what we expected and quit"""
+        token = self.tokenizer.current()
+        if(token is None or token[KIND] != kind):
+            self.unexpected(Parser.kindNames[kind])
+        self.tokenizer.readnext()
+        return token
 
-        elif(token):
-            if(not curToken):
-                self.perror(msg+" unexpected end of tokens")
-            elif(curToken != token):
-                self.perror(msg+" expected token '"+token+"' got '"+
-                            curToken.tvalue+"'")
 
-        self.tokenizer.readnext()
+    # names of the kinds of tokens in error messages
+    kindNames = {WORD: 'a name', VARIABLE: 'a variable', COMMA: "','",
+                 SEMICOLON: "';'", IMPLIES: "'=>'", ENDPROLOG: "'.'",
+                 STARTPARENTHESIS: "'('", ENDPARENTHESIS: "')'",
+                 DIRECTIVE: "':-'", STRING: 'a quoted file name'}
 
-        return curToken
+    # a formula is:  predicate (separator predicate)*  the tables
+    # map the kind of a separator to what is stored in the Formula
+    # (nothing on the left side since it is always ','), and end is
+    # the kind of token which ends the formula
+    leftTable  = {COMMA: None}
+    rightTable = {COMMA: intern(','), SEMICOLON: intern(';')}
 
+    # kinds of tokens which may start a term, and Term.ttype of them
+    termTypes  = {WORD: intern('WORD'), VARIABLE: intern('VARIABLE')}
 
     
     def parseTheory(self, filename=None):
         """
         syntax: axiomList
-        """
-        if(filename):
-            self.tokenizer = self.getTokens(filename)
-        else:
-            self.perror(lineNo(currentframe())+ 
-                        "  need something to parse")
 
+        if no filename is given, the tokens already given
+        to the parser are parsed (@see Parser.__init__)
+        """
         theory = Theory()
+        theory.symbols = self.symbols
+        theory.includes = self.includes
+
+        if(filename):
+            for axiom in self.parseAxioms(filename):
+                theory.append(axiom)
+            return theory
+        elif(not self.tokenizer):
+            sys.stderr.write("[ERROR] Parser: need something to parse\n")
+            sys.exit(1)
 
         if(not self.tokenizer.current()):
-            self.perror(lineNo(currentframe())+ 
-                        "  unexpected end of tokens ")
+            self.unexpected('an axiom')
 
         # parse axioms as long as there are tokens
         while(self.tokenizer.current()):
-            theory.append(self.parseAxiom())
+            if(self.tokenizer.current()[KIND] == DIRECTIVE):
+                theory.extend(self.parseInclude())
+            else:
+                theory.append(self.parseAxiom())
 
         return theory
 
 
+    def parseAxioms(self, filename):
+        """
+        generate axioms one at a time, the input is lexed while
+        we parse, so only the tokens of a single axiom are kept
+        """
+        self.filename = filename
+        self.tokenizer = self.getTokenStream(filename)
+
+        if(not self.tokenizer.current()):
+            self.unexpected('an axiom')
+
+        while(self.tokenizer.current()):
+            try:
+                if(self.tokenizer.current()[KIND] == DIRECTIVE):
+                    for axiom in self.parseInclude():
+                        yield axiom
+                else:
+                    yield self.parseAxiom()
+            except ParseError:
+                self.recover()
+            self.tokenizer.forget()
+
+
+    def checkTheory(self, filename):
+        """ parse filename and return all errors found, as a list
+        of (filename, line, column, message), libraries included
+        by filename are checked as well"""
+        self.errors = []
+        try:
+            for axiom in self.parseAxioms(filename):
+                pass
+        except ParseError:
+            pass # nothing to parse, already in errors
+        return self.errors
+
+
+    def parseInclude(self):
+        """syntax: ':-' include '(' STRING ')' . """
+
+        self.expect(DIRECTIVE)
+        if(self.expect(WORD)[VALUE] != 'include'):
+            self.perror("unknown directive, only include is known")
+        self.expect(STARTPARENTHESIS)
+        name = self.expect(STRING)
+        if(len(name[VALUE]) < 2 or not name[VALUE].endswith("'")):
+            self.perror("file name must end with a single quote")
+
+        # the library is read before the directive is done, so that
+        # errors about it are reported next to the file name
+        path = name[VALUE][1:-1]
+        if(not os.path.isabs(path)):
+            if(self.filename and self.filename != '-'):
+                path = os.path.join(os.path.dirname(self.filename), path)
+        path = os.path.abspath(path)
+
+        (axioms, includes) = self.library(path)
+
+        # symbols of the library get their ids where it is included,
+        # just as if the library was written into this file
+        for axiom in axioms:
+            axiom.addSymbols(self.symbols)
+        for stamp in includes:
+            if stamp not in self.includes:
+                self.includes.append(stamp)
+
+        self.expect(ENDPARENTHESIS)
+        self.expect(ENDPROLOG)
+
+        return axioms
+
+
+    def library(self, path):
+        """
+        return (axioms, includes) of library file path, the
+        library is only parsed again if the file has changed,
+        includes is a list of (path, size, mtime) for the library
+        and every library it includes itself
+        """
+        try:
+            st = os.stat(path)
+        except OSError, inst:
+            self.perror("include: "+str(inst))
+
+        stamp = (path, st.st_size, st.st_mtime)
+        cached = Parser.libraries.get(path)
+        if(cached and cached[0] == stamp):
+            return cached[1:]
+
+        if(path in Parser.including):
+            self.perror("include cycle: "+
+                        " -> ".join(Parser.including + [path]))
+
+        errors = len(self.errors or ())
+
+        Parser.including.append(path)
+        try:
+            parser = Parser()
+            parser.errors = self.errors
+            theory = parser.parseTheory(path)
+        finally:
+            Parser.including.pop()
+
+        includes = [ stamp ] + theory.includes
+
+        # a library with errors (when we check) is not kept
+        if(len(self.errors or ()) == errors):
+            Parser.libraries[path] = (stamp, list(theory), includes)
+
+        return (list(theory), includes)
 
 
     def parseAxiom(self):
         """syntax: L-Formula => R-Formula . """
        
         left = self.parseLeftAxiom()
-
-        self.skipExpectedToken(token='=>',msg=lineNo(currentframe()))
-
+        self.expect(IMPLIES)
         right = self.parseRightAxiom()
-
-        self.skipExpectedToken(token='.', msg=lineNo(currentframe()))
+        self.expect(ENDPROLOG)
 
         return Axiom(left, right)
 
@@ -129,89 +312,68 @@ class Parser(object):
     def parseRightAxiom(self):
         """ predicateList | goal | false """
 
-        tok = self.tokenizer
-        curToken = tok.current()
-
-        if(not curToken):
-            self.perror(lineNo(currentframe())+" unexpected end of tokens ")
-
-        if(curToken.ttype != 'WORD'):
-            self.perror(lineNo(currentframe())+" expected token of type 'WORD' got' "
-                        +str(curToken.ttype)+"'")
-
-        if(curToken.tvalue in ['false','goal']):
-            tok.readnext()
-            return SpecialFormula(curToken.tvalue)
-        else:
-            formula = Formula()
-            formula.append(self.parsePredicate())
-            while(1):
-                if(not tok.current()):
-                    self.perror(lineNo(currentframe())+" unexpected end of tokens")
-                    break
-                elif(tok.current().tvalue in [',', ';']):
-                    formula.append(tok.current().tvalue)
-                    tok.readnext()
-                    formula.append(self.parsePredicate())
-                elif(tok.current() == '.'):
-                    break
-                else:
-                    self.perror(lineNo(currentframe())+" expected ',' or '.'  got '"+
-                                tok.current().tvalue+"'")
-                    break
+        token = self.tokenizer.current()
 
-        return formula
+        if(token and token[KIND] == WORD and token[VALUE] in ('false', 'goal')):
+            self.tokenizer.readnext()
+            return SpecialFormula(token[VALUE])
 
+        return self.parseFormula(Parser.rightTable, ENDPROLOG)
 
 
     def parseLeftAxiom(self):
         """ predicateList | true """
 
-        tok = self.tokenizer
+        token = self.tokenizer.current()
+
+        if(token and token[KIND] == WORD and token[VALUE] == 'true'):
+            self.tokenizer.readnext()
+            return SpecialFormula('true')
 
-        if(not tok.current()):
-            self.perror(lineNo(currentframe())+" unexpected end of tokens ")
+        return self.parseFormula(Parser.leftTable, IMPLIES)
 
-        if(tok.current().ttype != 'WORD'):
-            self.perror(lineNo(currentframe())+" expected token of type 'WORD' got' "
-                        +str(tok.current().ttype)+"'")
 
-        if(tok.current() == 'true'):
+    def parseFormula(self, table, end):
+        """ predicate (separator predicate)* end, where table maps
+        the kinds of separators to what we store (@see leftTable)"""
+
+        tok = self.tokenizer
+        formula = Formula()
+        formula.append(self.parsePredicate())
+
+        while(1):
+            token = tok.current()
+            if(token is None):
+                break
+            kind = token[KIND]
+            if(kind == end):
+                return formula
+            if(kind not in table):
+                break
+            separator = table[kind]
+            if(separator):
+                formula.append(separator)
             tok.readnext()
-            return SpecialFormula('true')
-        else:
-            formula = Formula()
             formula.append(self.parsePredicate())
-            while(1):
-                if(not tok.current()):
-                    self.perror(lineNo(currentframe())+" unexpected end of tokens")
-                    break
-                elif(tok.current() == ','):
-                    # these are always separated by ',' so no need to store
-                    # the logical separator since formulas are geometric
-                    tok.readnext()
-                    formula.append(self.parsePredicate())
-                elif(tok.current() == '=>'):
-                    break
-                else:
-                    self.perror(lineNo(currentframe())+" expected ',' or '=>'  got '"+
-                                tok.current().tvalue+"'")
-                    break
 
-        return formula
+        expected = [ Parser.kindNames[k] for k in table.keys() + [end] ]
+        self.unexpected(' or '.join(expected))
 
 
     def parsePredicate(self):
         """ predicate:  'WORD' '(' TERMLIST ')' """
 
-        name = self.skipExpectedToken(ttype='WORD',
-                                      msg=lineNo(currentframe()))
-        predicate = Predicate(name.tvalue)
-        self.skipExpectedToken(token='(', msg=lineNo(currentframe()))
+        name = self.expect(WORD)
+        if(name[VALUE].startswith(Flattener.prefix)):
+            self.perror("predicate names starting with '%s' are kept "
+                        "for function terms"%(Flattener.prefix))
+        predicate = Predicate(name[VALUE])
+        self.expect(STARTPARENTHESIS)
         
         # termlist is added to predicate
         predicate.addTermList(self.parseTermList())
-        self.skipExpectedToken(token=')', msg=lineNo(currentframe()))
+        self.expect(ENDPARENTHESIS)
+        self.symbols.addPredicate(predicate)
 
         return predicate
 
@@ -219,42 +381,64 @@ class Parser(object):
     def parseTermList(self):
         """ termlist: term, term, term,... """
 
+        tok = self.tokenizer
         termlist = TermList()
         termlist.append(self.parseTerm())
 
-        while(self.tokenizer.current() == ','):
-            self.skipExpectedToken(token=',')
+        while(tok.current() and tok.current()[KIND] == COMMA):
+            tok.readnext()
             termlist.append(self.parseTerm())
 
         return termlist
         
 
     def parseTerm(self):
-        """ term : 'VARIABLE' | 'WORD' """
+        """ term : 'VARIABLE' | 'WORD' | 'WORD' '(' TERMLIST ')' """
 
-        curToken = self.tokenizer.current()
+        token = self.tokenizer.current()
+        ttype = None
 
-        if(not curToken):
-            self.perror(lineNo(currentframe())+" unexpected end of tokens")
-
-        if(not curToken.ttype in ['VARIABLE', 'WORD']):
-            self.perror(lineNo(currentframe())+" term must be of type 'VARIABLE' or "+
-                        "'WORD' not '"+curToken.ttype+"'")
+        if(token):
+            ttype = Parser.termTypes.get(token[KIND])
+        if(not ttype):
+            self.unexpected('a name or a variable')
 
         self.tokenizer.readnext()
 
-        return Term(curToken.tvalue, curToken.ttype)
+        # a name followed by '(' is a function term
+        args = ()
+        if(ttype == 'WORD'):
+            next = self.tokenizer.current()
+            if(next and next[KIND] == STARTPARENTHESIS):
+                self.tokenizer.readnext()
+                args = self.parseTermList()
+                self.expect(ENDPARENTHESIS)
+                ttype = 'FUNCTION'
+
+        return self.symbols.term(token[VALUE], ttype, args)
 
         
 
+#______________________________________________________________________________
+
+class ParseError(Exception):
+    """ raised instead of exit when we check (@see Parser.perror)"""
+    pass
+
 #______________________________________________________________________________
 
 class Theory(list):
     """
-    Theory holds a list of Axioms
+    Theory holds a list of Axioms, and the SymbolTable of
+    the axioms, which the parser fills as it goes, includes
+    is (path, size, mtime) of every library it includes
     """
+    __slots__ = ('maxConstant', 'symbols', 'includes')
+
     def __init__(self):
         self.maxConstant = 1
+        self.symbols = None
+        self.includes = []
 
     def printInfo(self):
         for ax in self:
@@ -262,12 +446,21 @@ class Theory(list):
             print "factAxiom", ax.factAxiom()
             print ax
 
-    def getPredicates(self):
-        """ we gather all predicates to fill template (Maude module)"""
-        preds = []
-        for ax in self:
-            ax.addPredicates(preds)
-        return preds
+    def getSymbols(self):
+        """ symbol table of this theory, built from the axioms
+        if the theory was not made by the parser"""
+        if self.symbols is None:
+            self.symbols = SymbolTable()
+            for ax in self:
+                ax.addSymbols(self.symbols)
+        return self.symbols
+
+    def flatten(self):
+        """ the same theory without function terms (@see Flattener),
+        this is what the Filler and the python engine work on """
+        if not self.getSymbols().functions:
+            return self
+        return Flattener(self).theory()
 
     def __repr__(self):
         return self.__str__()
@@ -277,48 +470,58 @@ class Theory(list):
 
     def toRuleRepresentation(self):
         """ 
-        before we have inserted natural numbers for
-        constants, and converted fresh variables in the 
-        right hand side of rules this will not work.
-        so this is done prior to the actual conversion
+        constants are given the natural numbers of the symbol
+        table, and fresh variables in the right hand side of
+        rules are given negative ints (@see Axiom.freshVariables)
         """
 
-        # insert natural numbers for constants
-        nd = natdict()
-        for ax in self:
-            ax.constants2nats(nd)
+        constants = self.getSymbols().constants
 
         # this will tell us how big the next 'fresh' constants is
-        self.maxConstant = max(nd.values()) + 1
-
-        # convert fresh variables in the rhs to negative ints
-        for ax in self:
-            ax.fresh2int()
+        self.maxConstant = len(constants) + 1
 
         # here we start with the actual conversion
         rules = []
         rulecount = 1
         rules.append("--- rewrite rules start")
         for ax in self:
-            rules.append(ax.toRuleRepresentation(rulecount))
+            rules.append(ax.toRuleRepresentation(rulecount, constants))
             rulecount += 1
         rules.append("--- rewrite rules done")
         return "\n".join(rules)
         
 
     def getFacts(self):
+        constants = self.getSymbols().constants
         facts = []
         for ax in self:
             if ax.factAxiom():
-                ax.addFacts(facts)
+                ax.addFacts(facts, constants)
+        if not facts:
+            return 'noFacts'
         return ', '.join(facts)
 
+    def getMetaFacts(self):
+        """ same as getFacts, but meta represented (upTerm) """
+        constants = self.getSymbols().constants
+        facts = []
+        for ax in self:
+            if ax.factAxiom():
+                ax.addMetaFacts(facts, constants)
+        if not facts:
+            return "'noFacts.FactSet"
+        if len(facts) == 1:
+            return facts[0]
+        return "'_`,_[%s]"%(', '.join(facts))
+
 #______________________________________________________________________________
 
 class Axiom(object):
     """
     Axiom  Formula => Formula
     """
+    __slots__ = ('left', 'right')
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
@@ -334,8 +537,11 @@ class Axiom(object):
         else:
             return 0
 
-    def addFacts(self, facts):
-        self.right.addFacts(facts)
+    def addFacts(self, facts, constants):
+        self.right.addFacts(facts, constants)
+
+    def addMetaFacts(self, facts, constants):
+        self.right.addMetaFacts(facts, constants)
 
     def factAxiom(self):
         """ true if axiom starts with antecedent 'true' """
@@ -344,27 +550,25 @@ class Axiom(object):
         else:
             return 0
 
-    def fresh2int(self):
+    def freshVariables(self):
+        """ variables in the rhs which are not in the lhs, numbered
+        in the order we find them, they are written as negative
+        ints in the rule:  X -> -1, Y -> -2 ..."""
+        fresh = Symbols()
         if not (self.goalAxiom() or self.factAxiom()):
-            leftVariables = []
-            self.left.insertLeftVariables(leftVariables)
-            nd = natdict()
-            self.right.findFreshVariables(leftVariables, nd)
-            self.right.insertRightVariables(nd)
-
-    def constants2nats(self, natconst):
-        if type(self.left) not in (SpecialFormula,):
-            for f1 in self.left:
-                f1.constants2nats(natconst)
-        if type(self.right) not in (SpecialFormula,):
-            for f2 in self.right:
-                if f2 not in [',',';']:
-                    f2.constants2nats(natconst)
-    
-    def addPredicates(self, preds):
-        """ add predicates to list preds """
-        self.left.addPredicates(preds)
-        self.right.addPredicates(preds)
+            leftVariables = set()
+            for predicate in self.left:
+                leftVariables.update(predicate.variables())
+            for predicate in self.getRight():
+                for v in predicate.variables():
+                    if v not in leftVariables:
+                        fresh.add(v)
+        return fresh
+
+    def addSymbols(self, symbols):
+        """ add predicates, constants and variables to symbols """
+        self.left.addSymbols(symbols)
+        self.right.addSymbols(symbols)
 
 
     def __repr__(self):
@@ -373,13 +577,14 @@ class Axiom(object):
     def __str__(self):
         return self.left.__str__() + " => " + self.right.__str__()
 
-    def toRuleRepresentation(self, count):
+    def toRuleRepresentation(self, count, constants):
         if not self.factAxiom():
+            fresh = self.freshVariables()
             rule = []
             rule.append('rl [ rule%d ]: '%(count))
-            rule.append(self.left.toRuleRepresentation(1))
+            rule.append(self.left.toRuleRepresentation(1, constants, fresh))
             rule.append(' => ')
-            rule.append(self.right.toRuleRepresentation(0))
+            rule.append(self.right.toRuleRepresentation(0, constants, fresh))
             rule.append(' . ')
             return ''.join(rule)
         return '---[ rule%d ]   removed because it was a fact-rule'%(count)
@@ -391,51 +596,41 @@ class Formula(list):
     Formula
     a list of Predicates separated by , or ;
     """
-    def __init__(self):
-        pass
+    __slots__ = ()
 
-    def addPredicates(self, preds):
-        """ add all predicates not alredy in preds"""
-        for predicate in self:
-            if predicate not in preds and predicate not in [',',';']:
-                preds.append( predicate )
+    def __init__(self, predicates=()):
+        list.__init__(self, predicates)
 
-    def constants2nats(self, natconst):
+    def addSymbols(self, symbols):
         for predicate in self:
             if predicate not in [',',';']:
-                predicate.constants2nats(natconst)
+                symbols.addPredicate(predicate)
+                for t in predicate.termlist:
+                    symbols.addTerm(t)
 
-    def toRuleRepresentation(self, leftside):
+    def toRuleRepresentation(self, leftside, constants, fresh):
         formularep = []
         for predicate in self:
             if predicate in [',',';']:
                 formularep.append(predicate)
             else:
-                formularep.append(predicate.toRuleRepresentation())
+                formularep.append(predicate.toRuleRepresentation(constants, fresh))
         if leftside:
             return ', '.join(formularep)
         else:
             return ' '.join(formularep)
 
-
-    def insertLeftVariables(self, leftvars):
-        for predicate in self:
-            predicate.insertLeftVariables(leftvars)
-
-    def findFreshVariables(self, leftvars, ndict):
+    def addFacts(self, facts, constants):
         for predicate in self:
             if predicate not in [',',';']:
-                predicate.findFreshVariables(leftvars, ndict)
+                facts.append(predicate.toRuleRepresentation(constants, {}))
 
-    def insertRightVariables(self, ndict):
+    def addMetaFacts(self, facts, constants):
         for predicate in self:
             if predicate not in [',',';']:
-                predicate.insertRightVariables(ndict)
-
-    def addFacts(self, facts):
-        for predicate in self:
-            if predicate not in [',',';']:
-                facts.append(predicate.toRuleRepresentation())
+                meta = predicate.toMetaRepresentation(constants)
+                if meta not in facts:
+                    facts.append(meta)
 
 #______________________________________________________________________________
 
@@ -445,29 +640,27 @@ class SpecialFormula(object):
     represent formula's which consist of a single
     constant, limited to: true, false, goal
     """
+    __slots__ = ('constant',)
+
     def __init__(self, constant):
-        self.constant = constant
+        self.constant = intern(constant)
 
     def __str__(self):
         return str(self.constant)
 
-    def addPredicates(self, preds):
-        """ 
-        just add this here to make SpecialFormula
-        seem like a regular Formula as far as adding
-        predicates go
-        """
-        pass
+    def __iter__(self):
+        """ no predicates in here """
+        return iter(())
 
-    def constants2nats(self, natconst):
+    def addSymbols(self, symbols):
         """ 
         just add this here to make SpecialFormula
-        seem like a regular Formula as far as converting
-        constants to natural numbers
+        seem like a regular Formula as far as adding
+        symbols go
         """
         pass
 
-    def toRuleRepresentation(self, leftside):
+    def toRuleRepresentation(self, leftside, constants=None, fresh=None):
         """ goal -> Goal, false -> False, true -> True"""
         return self.constant.capitalize()
 #______________________________________________________________________________
@@ -477,9 +670,11 @@ class Predicate(object):
     Predicate
     a name followed by a list of Terms
     """
-    def __init__(self, name):
-        self.name = name
-        self.termlist = None
+    __slots__ = ('name', 'termlist')
+
+    def __init__(self, name, termlist=None):
+        self.name = intern(name)
+        self.termlist = termlist
 
     def addTermList(self, tl):
         self.termlist = tl
@@ -494,17 +689,11 @@ class Predicate(object):
                     return 1
         return 0
 
-    def insertLeftVariables(self, leftvars):
-        for t in self.termlist:
-            t.insertLeftVariables(leftvars)
-
-    def findFreshVariables(self, leftvars, ndict):
-        for t in self.termlist:
-            t.findFreshVariables(leftvars, ndict)
-
-    def insertRightVariables(self, ndict):
+    def variables(self):
+        """ names of the variables, in the order we find them """
         for t in self.termlist:
-            t.insertRightVariables(ndict)
+            for v in t.variables():
+                yield v
 
     def __deepcopy__(self, orefs):
         """ 
@@ -512,13 +701,13 @@ class Predicate(object):
         sense that we fill all predicates with variables,
         unique variables.
         """
-        p = Predicate(self.name)
-        cnt = 1
-        fakeTermList = []
-        for i in range(0, self.__len__()):
-            fakeTermList.append("X%d:Int"%(cnt))
-            cnt += 1
-        p.addTermList(fakeTermList)
+        return Predicate.skeleton(self.name, self.__len__())
+
+    @staticmethod
+    def skeleton(name, arity):
+        """ predicate with variables X1:Int .. Xn:Int as terms """
+        p = Predicate(name)
+        p.addTermList([ "X%d:Int"%(i) for i in range(1, arity + 1) ])
         return p
 
 
@@ -531,17 +720,17 @@ class Predicate(object):
     def __str__(self):
         return str(self.name) + str(self.termlist) 
 
-    def constants2nats(self, natconst):
-        for t in self.termlist:
-            t.constants2nats(natconst)
-
-    def toRuleRepresentation(self):
+    def toRuleRepresentation(self, constants, fresh):
         prep = []
         prep.append(" %s( "%(self.name))
-        prep.append(self.termlist.toRuleRepresentation())
+        prep.append(self.termlist.toRuleRepresentation(constants, fresh))
         prep.append(" ) ")
         return ''.join(prep)
 
+    def toMetaRepresentation(self, constants):
+        terms = [ t.toMetaRepresentation(constants) for t in self.termlist ]
+        return "'%s[%s]"%(self.name, ', '.join(terms))
+
 
 #______________________________________________________________________________
 
@@ -550,73 +739,293 @@ class TermList(list):
     TermList
     a comma separated list of Terms
     """
-    def __init__(self):
-        pass
+    __slots__ = ()
 
-    def toRuleRepresentation(self):
+    def __init__(self, terms=()):
+        list.__init__(self, terms)
+
+    def toRuleRepresentation(self, constants, fresh):
         terms = []
         for t in self:
-            terms.append(t.toRuleRepresentation())
+            terms.append(t.toRuleRepresentation(constants, fresh))
         return ', '.join(terms)
 #______________________________________________________________________________
 
 class Term(object):
     """
     Term
-    a variable or constant
+    a variable, a constant or a function term f(t1, .., tn).
+    the terms made by the parser are hash-consed, i.e., equal
+    terms are the same node, with the same id, so they are
+    compared in O(1) (@see SymbolTable.term). this is why a
+    Term knows nothing about the axiom it is found in. ids are
+    only comparable within the SymbolTable which made them, an
+    included library has a table of its own, so ids are only
+    used within a single axiom (@see Flattener)
     """
-    def __init__(self, tvalue, ttype):
-        self.tvalue = tvalue
-        self.ttype = ttype
-        self.mtype = None
+    __slots__ = ('tvalue', 'ttype', 'args', 'id')
 
-    def constants2nats(self, natconst):
-        if self.ttype == 'WORD':
-            natconst.addConstant(self.tvalue)
-            self.mtype = str(natconst[self.tvalue])
-        else:
-            self.mtype = self.tvalue + ":Int"
-
-    def insertLeftVariables(self, leftvars):
-        if self.ttype == 'VARIABLE':
-            if self.tvalue not in leftvars:
-                leftvars.append(self.tvalue)
+    def __init__(self, tvalue, ttype, args=(), id=0):
+        self.tvalue = intern(tvalue)
+        self.ttype = intern(ttype)
+        self.args = args
+        self.id = id
 
-    def findFreshVariables(self, leftvars, ndict):
+    def variables(self):
+        """ names of the variables, in the order we find them """
         if self.ttype == 'VARIABLE':
-            if self.tvalue not in leftvars:
-                ndict.addConstant(self.tvalue)
-
-    def insertRightVariables(self, ndict):
+            yield self.tvalue
+        for a in self.args:
+            for v in a.variables():
+                yield v
+
+    def toRuleRepresentation(self, constants, fresh):
+        """ constants are natural numbers, variables are Int
+        variables, or negative ints if they are fresh """
+        if self.ttype == 'WORD':
+            return str(constants[self.tvalue])
         if self.ttype == 'VARIABLE':
-            if ndict.has_key(self.tvalue):
-                self.mtype = str( (-1 * ndict[self.tvalue]) )
+            if self.tvalue in fresh:
+                return str(-1 * fresh[self.tvalue])
+            return self.tvalue + ":Int"
+        raise Exception("Term: function terms must be flattened: "+str(self))
 
-    def toRuleRepresentation(self):
-        return self.mtype
+    def toMetaRepresentation(self, constants):
+        if self.ttype == 'WORD':
+            return metaInt(constants[self.tvalue])
+        return "'" + self.toRuleRepresentation(constants, {})
 
     def __repr__(self):
         return self.__str__()
 
     def __str__(self):
+        if self.args:
+            return "%s(%s)"%(self.tvalue, ', '.join(map(str, self.args)))
         return str(self.tvalue)
 #______________________________________________________________________________
 
 
-class natdict(dict):
+class Symbols(dict):
     """
     a small class which just wraps a dictionary
-    to get a mapping from constants to natural numbers
-    so constants: a,b,c,d,e -> 1,2,3,4,5 
+    to get a mapping from symbols to natural numbers
+    so constants: a,b,c,d,e -> 1,2,3,4,5, names holds
+    the symbols in the same order, i.e., names[id - 1]
     """
+    __slots__ = ('names',)
+
     def __init__(self):
         dict.__init__(self)
-        self.counter = 1
+        self.names = []
 
-    def addConstant(self, constant):
-        if not constant in self.keys():
-            self[constant] = self.counter
+    def add(self, symbol):
+        """ return id of symbol, a new one if it is not known """
+        id = self.get(symbol)
+        if id is None:
+            self.names.append(symbol)
+            id = len(self.names)
+            self[symbol] = id
+        return id
+
+#______________________________________________________________________________
+
+class SymbolTable(object):
+    """
+    SymbolTable
+    dense ids for the predicates (name, arity), constants,
+    variables and functions (name, arity) of a theory, in the
+    order the parser sees them, the id of a constant is also
+    its number in the Maude module. terms holds the hash-consed
+    Term nodes:  (ttype, tvalue, ids of args) -> Term
+    """
+    __slots__ = ('predicates', 'constants', 'variables', 'functions', 'terms')
+
+    def __init__(self):
+        self.predicates = Symbols()
+        self.constants = Symbols()
+        self.variables = Symbols()
+        self.functions = Symbols()
+        self.terms = {}
+
+    def addPredicate(self, predicate):
+        return self.predicates.add((predicate.name, len(predicate)))
+
+    def addTerm(self, term):
+        if term.ttype == 'WORD':
+            return self.constants.add(term.tvalue)
+        if term.ttype == 'VARIABLE':
+            return self.variables.add(term.tvalue)
+        for a in term.args:
+            self.addTerm(a)
+        return self.functions.add((term.tvalue, len(term.args)))
+
+    def term(self, tvalue, ttype, args=()):
+        """ the Term node of this structure, a new node gets
+        the next id, and its symbols are added """
+        key = (ttype, tvalue, tuple([ a.id for a in args ]))
+        node = self.terms.get(key)
+        if node is None:
+            node = Term(tvalue, ttype, tuple(args), len(self.terms) + 1)
+            self.terms[key] = node
+            self.addTerm(node)
+        return node
+
+#______________________________________________________________________________
+
+class Flattener(object):
+    """
+    Flattener
+    removes function terms from a theory, since Maude rules (and
+    the python engine) only know constants and variables. a
+    function f of arity n becomes a predicate fnXf of arity n+1,
+    where the last term is the value of f:
+
+        p(X) => p(f(X)) ; q(X).
+
+    becomes an exists rule which gives f(X) a value, only if it
+    has none already, followed by the rule itself:
+
+        p(X) => fnXf(X, F1).
+        p(X), fnXf(X, F1) => p(F1) ; q(X).
+
+    function terms in the lhs are matched through fnXf, and in
+    facts they are ground, so they become constants named by
+    the term:  true => p(f(a)).  ->  true => p(f(a)), fnXf(a, f(a)).
+    a function term of a fresh variable can have no value yet,
+    so it gets one in the disjunct where it is found:
+
+        r(X) => p(Y, f(Y)).  ->  r(X) => p(Y, F1), fnXf(Y, F1).
+    """
+
+    # no '_' in it, Maude reads that as an argument of a mixfix
+    # operator, the parser keeps predicate names with this prefix
+    # for us (@see Parser.parsePredicate)
+    prefix = 'fnX'
+
+    def __init__(self, theory):
+        self.source = theory
+        self.variables = theory.getSymbols().variables
+        self.counter = 0
+
+    def theory(self):
+        flat = Theory()
+        flat.includes = self.source.includes
+        for axiom in self.source:
+            if axiom.factAxiom():
+                flat.append(self.fact(axiom))
+            else:
+                flat.extend(self.rule(axiom))
+        flat.getSymbols()
+        return flat
+
+    def rule(self, axiom):
+        """ list of axioms without function terms """
+
+        values = {} # term id -> variable which holds its value
+        graph = []
+        left = Formula()
+        for predicate in axiom.left:
+            p = self.predicate(predicate, values, graph)
+            left.extend(graph)
+            left.append(p)
+            graph = []
+
+        if axiom.goalAxiom():
+            return [ Axiom(left, axiom.right) ]
+
+        bound = set()
+        for predicate in left:
+            bound.update(predicate.variables())
+
+        right = Formula()
+        local = dict(values) # terms of fresh variables, in this disjunct
+        for predicate in axiom.right:
+            if predicate in [',',';']:
+                if predicate == ';':
+                    local = dict(values)
+                right.append(predicate)
+            else:
+                atoms = []
+                terms = [ self.freeTerm(t, values, graph, local, atoms, bound)
+                          for t in predicate.termlist ]
+                right.append(Predicate(predicate.name, TermList(terms)))
+                for atom in atoms:
+                    right.append(intern(','))
+                    right.append(atom)
+
+        # each function term of the rhs gets its value in
+        # an exists rule of its own, innermost terms first
+        axioms = []
+        for atom in graph:
+            axioms.append(Axiom(Formula(left), Formula([atom])))
+            left.append(atom)
+        axioms.append(Axiom(left, right))
+
+        return axioms
+
+    def fact(self, axiom):
+        """ fact without function terms """
+        values = {}
+        graph = []
+        right = Formula()
+        for predicate in axiom.right:
+            if predicate in [',',';']:
+                right.append(predicate)
+            else:
+                right.append(self.predicate(predicate, values, graph, 1))
+        for atom in graph:
+            right.append(intern(','))
+            right.append(atom)
+        return Axiom(axiom.left, right)
+
+    def predicate(self, predicate, values, graph, ground=0):
+        terms = [ self.term(t, values, graph, ground) for t in predicate.termlist ]
+        return Predicate(predicate.name, TermList(terms))
+
+    def term(self, term, values, graph, ground):
+        """ variable or constant which is the value of term, the
+        fnX predicates which give it its value are added to graph"""
+        if term.ttype != 'FUNCTION':
+            return term
+        value = values.get(term.id)
+        if value is None:
+            args = [ self.term(a, values, graph, ground) for a in term.args ]
+            if ground:
+                value = Term(str(term), 'WORD')
+            else:
+                value = self.variable()
+            values[term.id] = value
+            graph.append(Predicate(Flattener.prefix + term.tvalue,
+                                   TermList(args + [ value ])))
+        return value
+
+    def freeTerm(self, term, values, graph, local, atoms, bound):
+        """ like term, but in the rhs, where function terms with
+        variables which are not bound by the lhs get their value
+        in local/atoms, i.e., in the disjunct they are found in """
+        if term.ttype != 'FUNCTION':
+            return term
+        for v in term.variables():
+            if v not in bound:
+                break
+        else:
+            return self.term(term, values, graph, 0)
+        value = local.get(term.id)
+        if value is None:
+            args = [ self.freeTerm(a, values, graph, local, atoms, bound)
+                     for a in term.args ]
+            value = self.variable()
+            local[term.id] = value
+            atoms.append(Predicate(Flattener.prefix + term.tvalue,
+                                   TermList(args + [ value ])))
+        return value
+
+    def variable(self):
+        """ new variable, which is not used by the theory """
+        self.counter += 1
+        while 'F%d'%(self.counter) in self.variables:
             self.counter += 1
+        return Term('F%d'%(self.counter), 'VARIABLE')
 
 #______________________________________________________________________________
 
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.pool
+
+starting Maude and parsing the whole template takes more time
+than the actual proof for most of our problems, so this file
+holds a pool of long-lived Maude processes. each process loads
+the static part of the template (MaudePrelude) once, after that
+only the GeoTheory module and the rewrite command is sent to it
+for each problem (@see Filler.getTheoryModule).
+
+example:
+
+    pool = MaudePool('/usr/bin/maude', 2, 3.0)
+    (result, fail) = pool.prove(filler.getTheoryModule(100))
+    pool.close()
+
+"""
+
+import os       # write/remove temporary files
+import tempfile # the prelude and the theories are loaded from files
+import Queue    # idle workers
+from org.noah.pexpect import pexpect
+from no.uio.ifi.bjarneh.util.subprocess import SubProcess
+from no.uio.ifi.bjarneh.cl.template.monologuetemplate import MaudePrelude
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='pool.py 0.1'
+
+
+class MaudeWorker(object):
+    """
+    MaudeWorker
+    a single Maude process which has loaded the prelude, the
+    process is started the first time it is needed, and it is
+    killed (and restarted later on) if a proof times out, since
+    there is no way to know what state Maude is in after that.
+    """
+
+    prompt      = "Maude> "
+    loadtimeout = 30  # seconds, loading the prelude
+
+    def __init__(self, maude, prelude, timeout):
+        self.maude = maude
+        self.prelude = prelude
+        self.timeout = timeout
+        self.child = None
+
+    def isalive(self):
+        return self.child and self.child.isalive()
+
+    def spawn(self):
+        """ start Maude and wait for it to load the prelude"""
+        args = []
+        args.append('-no-banner')
+        args.append('-no-ansi-color')
+        args.append(self.prelude)
+        self.child = SubProcess.spawn(self.maude, args=args,
+                                      timeout=MaudeWorker.loadtimeout)
+        self.child.expect(MaudeWorker.prompt)
+
+    def kill(self):
+        if self.child and self.child.isalive():
+            self.child.terminate(force=1)
+        self.child = None
+
+    def quit(self):
+        """ ask Maude to quit nicely, kill it if that fails"""
+        if self.isalive():
+            try:
+                self.child.sendline('q')
+                self.child.expect(pexpect.EOF, timeout=1)
+            except: pass
+        self.kill()
+
+    def prove(self, TheoryModule, timeout=None):
+        """
+        load theory module into Maude, return (result, fail) where
+        result is what Maude reports after the rewrite, and fail
+        is the message to give if we got no result, timeout is
+        the one of the pool unless it is given
+        """
+        result = None
+        fail   = None
+
+        if timeout is None:
+            timeout = self.timeout
+
+        (fd, fname) = tempfile.mkstemp(suffix=".maude",
+                                       prefix="monologue-",
+                                       text=1)
+        os.write(fd, TheoryModule)
+        os.close(fd)
+
+        try:
+            if not self.isalive():
+                self.spawn()
+            self.child.sendline('load ' + fname)
+            i = self.child.expect(["(rewrites: .*?)" + MaudeWorker.prompt,
+                                   MaudeWorker.prompt],
+                                  timeout=timeout)
+            if i == 0:
+                result = str(self.child.match.groups()[0])
+            else:
+                fail = "[ERROR] Maude gave no result\n"
+        except pexpect.TIMEOUT:
+            fail = "[TIMEOUT]\n"
+            self.kill()
+        except pexpect.EOF:
+            fail = "[ERROR] Maude gave no result\n"
+            self.kill()
+        except Exception, inst:
+            fail = "[ERROR] Maude: %s\n"%(str(inst).split('\n')[0])
+            self.kill()
+
+        os.unlink(fname)
+
+        return (result, fail)
+
+#______________________________________________________________________________
+
+class MaudePool(object):
+    """
+    MaudePool
+    hands out idle workers, and blocks when all workers are busy,
+    the prelude is written to a temporary file which all workers
+    load when they start up.
+    """
+
+    def __init__(self, maude, size, timeout):
+        (fd, self.prelude) = tempfile.mkstemp(suffix=".maude",
+                                              prefix="monologue-prelude-",
+                                              text=1)
+        os.write(fd, MaudePrelude)
+        os.close(fd)
+
+        self.workers = []
+        self.idle = Queue.Queue()
+
+        for i in range(0, size):
+            worker = MaudeWorker(maude, self.prelude, timeout)
+            self.workers.append(worker)
+            self.idle.put(worker)
+
+    def prove(self, TheoryModule, timeout=None):
+        """ wait for an idle worker and let it prove the theory"""
+        worker = self.idle.get()
+        try:
+            return worker.prove(TheoryModule, timeout)
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        """ stop all Maude processes and remove the prelude"""
+        for worker in self.workers:
+            worker.quit()
+        if os.path.isfile(self.prelude):
+            os.unlink(self.prelude)
+
+
+if __name__ == '__main__':
+    pass
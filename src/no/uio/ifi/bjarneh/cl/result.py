@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+no.uio.ifi.bjarneh.cl.result
+
+what came out of proving a single theory, instead of the raw
+text Maude gives us. the Maude text looks like this:
+
+    rewrites: 1042 in 12ms cpu (13ms real) (86833 rewrites/second)
+    result Search: valid
+
+and is turned into a ProofResult by ProofResult.fromMaude, the
+status is one of: valid, saturated, timeout, error,
+countersatisfiable when a countermodel is found (@see engine.finder)
+and unknown when the sat engine can neither prove nor refute it
+
+example:
+
+    result = ProofResult.fromMaude(text)
+    result.inputfile = 'problems/ap.gl'
+    output.write(result.toJSON() + '\\n')
+
+"""
+
+import re       # parse Maude output
+try:
+    import json
+except ImportError:
+    import simplejson as json
+try:
+    from collections import OrderedDict
+except ImportError:
+    OrderedDict = dict
+
+
+__author__='bjarneh@ifi.uio.no'
+__version__='result.py 0.1'
+
+
+class ProofResult(object):
+    """
+    ProofResult
+    times are given in milliseconds, fields we know nothing
+    about are None (e.g. cpu time of the python engine)
+    """
+
+    statuses = ('valid', 'saturated', 'timeout', 'error',
+                'countersatisfiable', 'unknown')
+
+    rewritesRe = re.compile(r"rewrites: (\d+) in (\d+)ms cpu "
+                            r"\((\d+)ms real\) \((\d+|~) rewrites/second\)")
+    resultRe   = re.compile(r"result \w+: (\w+)")
+
+    def __init__(self, status, rewrites=None, cpu=None, real=None,
+                 rps=None, engine='maude'):
+        if status not in ProofResult.statuses:
+            raise Exception("ProofResult: unknown status: " + str(status))
+        self.status = status
+        self.rewrites = rewrites
+        self.cpu = cpu
+        self.real = real
+        self.rps = rps
+        self.engine = engine
+        self.wall = None
+        self.cached = 0
+        self.inputfile = None
+        self.model = None
+        self.modelOf = None     # input or optimized (@see Main.optimize)
+
+    @staticmethod
+    def fromMaude(text):
+        """ parse what Maude wrote (or SubProcess in case of timeout)"""
+
+        if text.find("[TIMEOUT]") >= 0:
+            return ProofResult('timeout')
+
+        m = ProofResult.rewritesRe.search(text)
+        if not m:
+            return ProofResult('error')
+
+        rps = None
+        if m.group(4) != '~':
+            rps = int(m.group(4))
+
+        # Maude stops rewriting without reaching 'valid' when
+        # no rule can add anything new to a branch
+        status = 'saturated'
+        r = ProofResult.resultRe.search(text, m.end())
+        if r and r.group(1) == 'valid':
+            status = 'valid'
+
+        return ProofResult(status,
+                           rewrites=int(m.group(1)),
+                           cpu=int(m.group(2)),
+                           real=int(m.group(3)),
+                           rps=rps)
+
+    def toDict(self):
+        d = OrderedDict()
+        d['file']     = self.inputfile
+        d['status']   = self.status
+        d['engine']   = self.engine
+        d['rewrites'] = self.rewrites
+        d['cpu_ms']   = self.cpu
+        d['real_ms']  = self.real
+        d['rewrites_per_second'] = self.rps
+        d['wall_ms']  = self.wall
+        d['cached']   = bool(self.cached)
+        d['model']    = self.model
+        d['model_of'] = self.modelOf
+        return d
+
+    def toJSON(self):
+        """ one line of JSON, i.e., one record of a JSONL file """
+        return json.dumps(self.toDict())
+
+    def __str__(self):
+        return "ProofResult(%s)"%(self.status)
+
+
+if __name__ == '__main__':
+    pass
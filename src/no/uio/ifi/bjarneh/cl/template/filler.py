@@ -17,8 +17,9 @@ into a Maude module. This is what will be filled by this class:
 
 """
 
-import copy
 from no.uio.ifi.bjarneh.cl.template.monologuetemplate import MaudeTemplate
+from no.uio.ifi.bjarneh.cl.template.monologuetemplate import TheoryTemplate
+from no.uio.ifi.bjarneh.cl.parse.Parser import metaInt, Predicate
 
 __author__='bjarneh@ifi.uio.no'
 __version__='filler.py 0.1'
@@ -26,9 +27,10 @@ __version__='filler.py 0.1'
 
 class Filler(object):
     def __init__(self, theory):
-        self.theory = theory
-        preds = theory.getPredicates()
-        self.preds = copy.deepcopy(preds)
+        self.theory = theory.flatten()
+        symbols = self.theory.getSymbols()
+        self.preds = [ Predicate.skeleton(name, arity)
+                       for (name, arity) in symbols.predicates.names ]
 
     def surround(self, start, end, elmt):
         return start + str(elmt) + end
@@ -121,5 +123,20 @@ class Filler(object):
                              self.getFacts(),
                              self.theory.maxConstant) #depth
 
+    def getTheoryModule(self, depth):
+        """ fill only the parts of the template which depend on the
+        theory, this is what a Maude process that has already loaded
+        the prelude needs (@see MaudePrelude), the print statement
+        is never turned on here since it needs the predicates at
+        the object level of ObjectLevelRules"""
+        return TheoryTemplate%(self.getOpDecl(),
+                               self.getRefresh(),
+                               self.getMaximum(),
+                               self.getv2z(),
+                               self.getHelpex(),
+                               self.getRules(),
+                               self.theory.getMetaFacts(),
+                               metaInt(self.theory.maxConstant)) #depth
+
 if __name__ == '__main__':
     pass
@@ -24,7 +24,7 @@ the content that needs to be filled:
 __author__='bjarneh@ifi.uio.no'
 __version__='monologuetemplate.py 0.1'
 
-MaudeTemplate="""
+GeoTermTemplate="""
 ---- This is an attempt at making a rewrite theory able to
 ---- prove formulas in geometric logic, or coherent logic.
 ---- 
@@ -60,6 +60,9 @@ subsort FactSet < Disjoint .
 op Goal  : -> Disjoint .
 op False : -> Disjoint .
 
+--- the facts of a theory without any
+op noFacts : -> FactSet .
+
 --- start compile time
 %s
 --- end compile time
@@ -158,6 +161,9 @@ endfm
 
 
 
+"""
+
+GeoTheoryTemplate="""\
 mod GeoTheory is
 
 protecting META-LEVEL .
@@ -172,6 +178,9 @@ vars X Y Z U : Int .
 endm
 
 
+"""
+
+SetRewriteModule="""\
 mod SetRewrite is
 
 protecting GeoTheory .
@@ -721,6 +730,9 @@ eq  splitMatch( METAFACTS,  { SUB1 | '_;_[ empty ] }  ) = false
 endm
 
 
+"""
+
+ObjectLevelRulesModule="""\
 mod ObjectLevelRules is
 
 pr SetRewrite .
@@ -907,6 +919,9 @@ if goalMatch( METAFACTS )
 
 endm
 
+"""
+
+RewriteTemplate="""\
 --- set print attribute on or not
 %s
 
@@ -916,3 +931,60 @@ rewrite in ObjectLevelRules :
 
 q
 """
+
+MaudeTemplate = (GeoTermTemplate +
+                 GeoTheoryTemplate +
+                 SetRewriteModule +
+                 ObjectLevelRulesModule +
+                 RewriteTemplate)
+
+
+# the prelude is the static part of the template, it is loaded
+# once by each long-lived Maude process (@see cl.pool), the theory
+# specific parts of GeoTerm are moved into GeoTheory, and SetRewrite
+# only protects GeoTerm, this way a new GeoTheory module never
+# forces Maude to redo SetRewrite or ObjectLevelRules
+
+MaudePrelude = (GeoTermTemplate%('', '', '', '', '') +
+                SetRewriteModule.replace('protecting GeoTheory .',
+                                         'protecting GeoTerm .') +
+                ObjectLevelRulesModule)
+
+# the content that needs to be filled for each problem:
+#
+# 1. predicate definitions        (definition)
+# 2. refresh definitions          (equation)
+# 3. maximum definitions          (equation)
+# 4. v2z definitions              (equation)
+# 5. helpex definitions           (equation)
+# 6. GeoTheory rewrite rules      (rewrite rules)
+# 7. meta representation of facts
+# 8. meta representation of the next fresh constant
+#
+# the rewrite command is given at the meta level, since the
+# predicates are unknown to ObjectLevelRules in the prelude
+
+TheoryTemplate="""\
+mod GeoTheory is
+
+protecting META-LEVEL .
+protecting GeoTerm .
+
+vars X Y Z U : Int .
+var  N1      : Nat .
+
+--- start compile time
+%s
+%s
+%s
+%s
+%s
+%s
+--- end compile time
+
+endm
+
+rewrite in ObjectLevelRules :
+  < %s | %s | nil | nil | nil | nil >
+  stack void  .
+"""
@@ -12,6 +12,7 @@ to wait for a maximum period of time before killing child
 process, and you can also specify that you want a hashbar.
 """
 
+import os
 from org.noah.pexpect import pexpect
 from no.uio.ifi.bjarneh.txt.hashbar import HashBar
 
@@ -44,11 +45,24 @@ class SubProcess(object):
         except: pass
         return result
 
+    @staticmethod
+    def spawn(cmd, **kwargs):
+        """ pexpect.spawn, if cmd cannot be run the forked child
+        raises too, and it must not go on running our program """
+        pid = os.getpid()
+        try:
+            return pexpect.spawn(cmd, **kwargs)
+        except:
+            if os.getpid() != pid:
+                os._exit(1)
+            raise
+
     def start(self):
+        """ run process, return what was written to output """
         if self.hb:
-            self.hashBarSpawn()
+            return self.hashBarSpawn()
         else:
-            self.noHashBarSpawn()
+            return self.noHashBarSpawn()
 
     def hashBarSpawn(self):
 
@@ -59,13 +73,18 @@ class SubProcess(object):
         child  = None
         
         try:
-            child = pexpect.spawn(self.cmd, args=self.args, timeout=self.timeout)
+            child = SubProcess.spawn(self.cmd, args=self.args, timeout=self.timeout)
             child.expect("(rewrites: .*)Bye")
             result = str(child.match.groups()[0])
-        except:
+        except pexpect.TIMEOUT:
             fail = "[TIMEOUT]\n"
-            if child and child.isalive():
-                child.terminate(force=1)
+        except pexpect.EOF:
+            fail = "[ERROR] Maude gave no result\n"
+        except Exception, inst:
+            fail = SubProcess.error(inst)
+
+        if child and child.isalive():
+            child.terminate(force=1)
 
 ##         tred.finished.getDone()
         tred.stop()
@@ -74,17 +93,33 @@ class SubProcess(object):
         if result : self.output.write(result)
         if fail   : self.output.write(fail)
 
+        return result or fail
+
 
     def noHashBarSpawn(self):
         child = None
         try:
-            child = pexpect.spawn(self.cmd, args=self.args, 
-                                  timeout=self.timeout, logfile=self.output)
+            child = SubProcess.spawn(self.cmd, args=self.args, 
+                                     timeout=self.timeout, logfile=self.output)
             child.expect(pexpect.EOF)
-        except:
-            self.output.write("[TIMEOUT] \n")
-            if child and child.isalive():
-                child.terminate(force=1)
+            if child.before.strip():
+                return child.before
+            fail = "[ERROR] Maude gave no result\n"
+        except pexpect.TIMEOUT:
+            fail = "[TIMEOUT] \n"
+        except Exception, inst:
+            fail = SubProcess.error(inst)
+
+        self.output.write(fail)
+        if child and child.isalive():
+            child.terminate(force=1)
+        return fail
+
+    @staticmethod
+    def error(inst):
+        """ what to report when Maude could not be run, e.g., it
+        could not be started, only the first line of pexpect """
+        return "[ERROR] Maude: %s\n"%(str(inst).split('\n')[0])
 
 
     